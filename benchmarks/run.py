@@ -0,0 +1,247 @@
+"""
+Measure the per-request overhead of ViewTestCase.request and
+APITestCase.request.
+
+Each scenario sends the same request through django-skivvy and through a
+plain RequestFactory set up like django-skivvy does it, then reports
+both timings and their difference. Results are written as JSON so runs
+can be compared across changes to the library:
+
+    python -m benchmarks.run --output bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import django
+from django.conf import settings
+
+
+def configure():
+    settings.configure(
+        DEBUG=False,
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
+                               'NAME': ':memory:'}},
+        SECRET_KEY='not very secret in benchmarks',
+        INSTALLED_APPS=(
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'django.contrib.sessions',
+            'django.contrib.messages',
+        ),
+        TEMPLATES=[
+            {
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [os.path.join(os.path.dirname(__file__),
+                                      'templates')],
+                'OPTIONS': {
+                    'context_processors': [
+                        'django.template.context_processors.request',
+                        'django.contrib.auth.context_processors.auth',
+                        'django.contrib.messages.context_processors.messages',
+                    ],
+                },
+            },
+        ]
+    )
+    django.setup()
+
+
+def get_scenarios():
+    from skivvy import APITestCase, ViewTestCase
+    from . import views
+
+    class RowsCase(ViewTestCase):
+        view_class = views.RowsTemplateView
+
+    class CsrfCase(ViewTestCase):
+        view_class = views.CsrfTemplateView
+
+    class FixedCsrfCase(ViewTestCase):
+        view_class = views.CsrfTemplateView
+        fixed_csrf_token = 'benchmark-token'
+
+    class FormCase(ViewTestCase):
+        view_class = views.FormView
+
+    class RowsAPICase(APITestCase):
+        view_class = views.RowsAPIView
+
+    def fields(count):
+        return {'field_{}'.format(i): 'value {}'.format(i)
+                for i in range(count)}
+
+    scenarios = []
+    for rows in (10, 1000, 10000):
+        scenarios.append(('html_get_rows_{}'.format(rows), RowsCase,
+                          {'get_data': {'rows': rows}}))
+    for forms in (10, 1000):
+        scenarios.append(('html_get_csrf_forms_{}'.format(forms), CsrfCase,
+                          {'get_data': {'forms': forms}}))
+        scenarios.append(('html_get_fixed_csrf_forms_{}'.format(forms),
+                          FixedCsrfCase, {'get_data': {'forms': forms}}))
+    for count in (10, 1000):
+        scenarios.append(('html_post_urlencoded_{}'.format(count), FormCase,
+                          {'method': 'POST', 'post_data': fields(count)}))
+    for rows in (10, 1000, 10000):
+        scenarios.append(('json_get_rows_{}'.format(rows), RowsAPICase,
+                          {'get_data': {'rows': rows}}))
+    for count in (10, 1000):
+        scenarios.append(('json_post_json_{}'.format(count), RowsAPICase,
+                          {'method': 'POST', 'post_data': fields(count)}))
+        scenarios.append(('json_post_multipart_{}'.format(count),
+                          RowsAPICase,
+                          {'method': 'POST', 'post_data': fields(count),
+                           'content_type': 'multipart/form-data'}))
+    return scenarios
+
+
+def baseline(case, kwargs):
+    """
+    Send the request without django-skivvy: the request factory, session,
+    message storage and user are set up by hand and the response is
+    rendered and decoded, but not post-processed.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.contrib.messages.storage.fallback import FallbackStorage
+    from skivvy import APITestCase
+    from skivvy.multipart import MultipartEncoder
+    from skivvy.sessions import SessionStore
+
+    method = kwargs.get('method', 'GET')
+    data = kwargs.get('post_data', {})
+    content_type = kwargs.get('content_type')
+    if method == 'POST' and isinstance(case, APITestCase):
+        data, content_type = case._encode_post_data(
+            data, content_type=content_type or 'application/json')
+        if isinstance(data, MultipartEncoder):
+            # The encoder streams its body once; send the encoded bytes.
+            data = data.read()
+    elif method == 'POST':
+        content_type = 'application/x-www-form-urlencoded'
+        data = case._url_encode_data(data)
+    query = case._url_encode_data(kwargs.get('get_data', {}))
+
+    def send():
+        factory = case.request_factory()
+        request = getattr(factory, method.lower())(
+            '/?' + query, data, content_type=content_type)
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        request.user = AnonymousUser()
+        response = case.view_class.as_view()(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content.decode('utf-8')
+    return send
+
+
+def measure(func, iterations, warmup):
+    for _ in range(warmup):
+        func()
+
+    gc.collect()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(iterations, warmup, name_filter=None):
+    from skivvy.benchmark import percentile
+
+    results = []
+    for name, case_class, kwargs in get_scenarios():
+        if name_filter and name_filter not in name:
+            continue
+
+        case = case_class()
+
+        def send():
+            return case.request(**kwargs).content
+
+        timings = measure(send, iterations, warmup)
+        baseline_timings = measure(baseline(case, kwargs), iterations,
+                                   warmup)
+        median = statistics.median(timings)
+        baseline_median = statistics.median(baseline_timings)
+        results.append({
+            'name': name,
+            'iterations': iterations,
+            'mean': statistics.mean(timings),
+            'median': median,
+            'p95': percentile(sorted(timings), 95),
+            'min': min(timings),
+            'requests_per_second': 1 / median,
+            'baseline_median': baseline_median,
+            'overhead_median': median - baseline_median,
+        })
+    return results
+
+
+def compare(results, previous, threshold):
+    previous = {result['name']: result for result in previous['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old and result['median'] > old['median'] * (1 + threshold):
+            regressions.append((result['name'], old['median'],
+                                result['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--output', default='bench_output.json',
+                        help='File to write the results to.')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--filter', dest='name_filter',
+                        help='Only run scenarios with this in their name.')
+    parser.add_argument('--compare',
+                        help='Results of a previous run to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Slowdown of the median, relative to the '
+                             'previous run, that counts as a regression.')
+    args = parser.parse_args(argv)
+
+    configure()
+    import rest_framework
+    import skivvy
+
+    results = run(args.iterations, args.warmup, args.name_filter)
+    report = {
+        'skivvy': skivvy.__version__,
+        'django': django.get_version(),
+        'rest_framework': rest_framework.VERSION,
+        'python': platform.python_version(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        sys.stdout.write(
+            '{name:<32} median {median:10.6f}s  '
+            'overhead {overhead_median:10.6f}s  '
+            '{requests_per_second:10.1f} req/s\n'.format(**result))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, old, new in regressions:
+            sys.stdout.write('Regression in {}: {:.6f}s -> {:.6f}s\n'.format(
+                name, old, new))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from django.http import HttpResponse
+from django.views.generic import TemplateView
+
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+
+def make_rows(count):
+    return [{'id': i,
+             'name': 'Item {}'.format(i),
+             'description': 'Description of item {} & <more>'.format(i)}
+            for i in range(count)]
+
+
+class RowsTemplateView(TemplateView):
+    template_name = 'bench_rows.html'
+
+    def get_context_data(self, **kwargs):
+        return {'rows': make_rows(int(self.request.GET.get('rows', 10)))}
+
+
+class CsrfTemplateView(TemplateView):
+    template_name = 'bench_csrf.html'
+
+    def get_context_data(self, **kwargs):
+        return {'forms': range(int(self.request.GET.get('forms', 10)))}
+
+
+class FormView(TemplateView):
+    def post(self, request, *args, **kwargs):
+        return HttpResponse('<p>{} fields</p>'.format(len(request.POST)))
+
+
+class RowsAPIView(APIView):
+    def get(self, request, *args, **kwargs):
+        return Response(make_rows(int(request.GET.get('rows', 10))))
+
+    def post(self, request, *args, **kwargs):
+        return Response({'fields': len(request.data)})
@@ -17,4 +17,6 @@ module.exports =
   '# Responses\n' +
   fs.readFileSync('./content/response.md', 'utf8') + '\n' +
   '# Redirects\n' +
-  fs.readFileSync('./content/redirects.md', 'utf8') + '\n';
+  fs.readFileSync('./content/redirects.md', 'utf8') + '\n' +
+  '# Performance\n' +
+  fs.readFileSync('./content/performance.md', 'utf8') + '\n';
@@ -80,6 +80,9 @@ setup(
     packages=get_packages(package),
     package_data=get_package_data(package),
     install_requires=[],
+    entry_points={
+        'pytest11': ['skivvy = skivvy.pytest_plugin'],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Environment :: Web Environment',
@@ -90,7 +93,6 @@ setup(
         'License :: OSI Approved :: GNU Affero General Public License v3',
         'Operating System :: OS Independent',
         'Natural Language :: English',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
@@ -1,102 +1,873 @@
 from urllib import parse
+from codecs import getincrementaldecoder
+from concurrent import futures
+import os
 import re
+import copy
+import inspect
+import hashlib
 import json
+import time
+import itertools
+import functools
+import multiprocessing
+import weakref
 from importlib import import_module
-from collections import namedtuple
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 from django.core.exceptions import ImproperlyConfigured
-from django.contrib.auth.models import AnonymousUser
-from django.contrib.messages.storage.fallback import FallbackStorage
-from django.template.loader import render_to_string
-from django.contrib.messages.api import get_messages
-from django.test.client import encode_multipart
-from django.test import RequestFactory
 from django.conf import settings
-from rest_framework.test import APIRequestFactory, force_authenticate
-try:
-    # For Django 1.11.x
-    from django.core.urlresolvers import reverse
-except ImportError:
-    # For Django 2.x
-    from django.urls import reverse
+from django.db import close_old_connections, connections
+from django.core.signals import request_finished, setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .benchmark import run_benchmark
+from .codecs import get_json_codec
+from .html import compare_html, parse_expected_html
+from .multipart import MultipartEncoder
+from .probes import MemoryProbe, ProfileProbe, QueryProbe
+from .signals import request_dispatched
+from .snapshots import diff_snapshot, get_store
 
 __version__ = '0.1.12'
-SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
-Response = namedtuple('Response',
-                      'status_code content location messages headers')
+
+
+def _lazy_field(name):
+    attr = '_' + name
+
+    def get(self):
+        loader = self._loaders.get(name)
+        if loader is not None:
+            setattr(self, attr, loader())
+            del self._loaders[name]
+        return getattr(self, attr)
+    return property(get)
+
+
+class ContentStream:
+    def __init__(self, chunks, algorithm='sha256', close=None):
+        self.length = 0
+        self._hash = hashlib.new(algorithm)
+        self._iterator = self._iterate(chunks, close)
+
+    def __iter__(self):
+        return self._iterator
+
+    def _iterate(self, chunks, close):
+        try:
+            for chunk in chunks:
+                self.length += len(chunk)
+                self._hash.update(chunk)
+                yield chunk
+        finally:
+            if close is not None:
+                # Same as Django's test client: closing the response must not
+                # close the test's database connection.
+                request_finished.disconnect(close_old_connections)
+                close()
+                request_finished.connect(close_old_connections)
+
+    def consume(self):
+        for _ in self._iterator:
+            pass
+
+    @property
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class _PickledStream:
+    """
+    Stands in for the content stream of an unpickled response. Length and
+    digest are kept, but the chunks of a streaming response are not.
+    """
+
+    def __init__(self, length, hexdigest, content=None):
+        self.length = length
+        self.hexdigest = hexdigest
+        self.content = content
+
+    def __iter__(self):
+        if self.content is None:
+            raise ValueError(
+                "The content of a streaming response isn't kept when the "
+                "response is pickled, for instance by request_many() with "
+                "pool='process'")
+        return iter([self.content])
+
+    def consume(self):
+        pass
+
+
+class Timings(OrderedDict):
+    @property
+    def total(self):
+        return sum(self.values())
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[name] = self.get(name, 0) + time.perf_counter() - start
+
+
+def _get_timings(response):
+    timings = getattr(response, 'timings', None)
+    if timings is None:
+        timings = response.timings = Timings()
+    return timings
+
+
+class Response:
+    __slots__ = ('status_code', 'location', 'queries', 'timings',
+                 'memory_peak', 'memory_net', '_content', '_messages',
+                 '_headers', '_raw_content', '_stream', '_loaders')
+    _fields = ('status_code', 'content', 'location', 'messages', 'headers')
+
+    def __init__(self, status_code, content=None, location=None,
+                 messages=None, headers=None, stream=None, queries=None,
+                 timings=None, loaders=None, memory_peak=None,
+                 memory_net=None, raw_content=None):
+        self.status_code = status_code
+        self.location = location
+        self.queries = queries
+        self.timings = timings
+        self.memory_peak = memory_peak
+        self.memory_net = memory_net
+        self._content = content
+        self._messages = messages
+        self._headers = headers
+        self._raw_content = raw_content
+        self._stream = stream
+        self._loaders = dict(loaders or {})
+
+    content = _lazy_field('content')
+    messages = _lazy_field('messages')
+    headers = _lazy_field('headers')
+    raw_content = _lazy_field('raw_content')
+    stream = _lazy_field('stream')
+
+    @property
+    def query_count(self):
+        if self.queries is not None:
+            return len(self.queries)
+
+    @property
+    def query_time(self):
+        if self.queries is not None:
+            return sum(float(query['time']) for query in self.queries)
+
+    @property
+    def chunks(self):
+        return iter(self.stream)
+
+    @property
+    def content_length(self):
+        self.stream.consume()
+        return self.stream.length
+
+    @property
+    def content_digest(self):
+        self.stream.consume()
+        return self.stream.hexdigest
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        # Only load the fields that are asked for.
+        if isinstance(index, slice):
+            return tuple(getattr(self, name) for name in self._fields[index])
+        return getattr(self, self._fields[index])
+
+    def __eq__(self, other):
+        if isinstance(other, (Response, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        raw_content = self.raw_content
+        stream = self.stream
+        if stream is not None:
+            stream.consume()
+            stream = _PickledStream(stream.length, stream.hexdigest,
+                                    content=raw_content)
+        return (Response, tuple(self) + (stream, self.queries, self.timings,
+                                         None, self.memory_peak,
+                                         self.memory_net, raw_content))
+
+    def __repr__(self):
+        return 'Response({})'.format(', '.join(
+            '{}={!r}'.format(name, value)
+            for name, value in zip(self._fields, self)))
+
+    def _asdict(self):
+        return OrderedDict(zip(self._fields, self))
+
+
+_CSRF_INPUT = re.compile(r'<input[^>]+csrfmiddlewaretoken[^>]+>')
+_CSRF_INPUT_BYTES = re.compile(rb'<input[^>]+csrfmiddlewaretoken[^>]+>')
 
 
 def remove_csrf(html):
-    csrf_regex = r'<input[^>]+csrfmiddlewaretoken[^>]+>'
-    return re.sub(csrf_regex, '', html)
+    # Bytes are scrubbed as they are: '<' and '>' never occur inside
+    # multi-byte UTF-8 sequences, so there is no need to decode first.
+    if isinstance(html, (bytes, bytearray)):
+        if b'csrfmiddlewaretoken' not in html:
+            return html
+        return _CSRF_INPUT_BYTES.sub(b'', html)
+    if 'csrfmiddlewaretoken' not in html:
+        return html
+    return _CSRF_INPUT.sub('', html)
+
+
+_CSRF_VALUE_BYTES = re.compile(rb'\bvalue="[^"]*"')
+
+
+def _replace_csrf_token(html, token):
+    # For responses whose context couldn't be given the fixed token, so
+    # they still match content rendered with it.
+    if b'csrfmiddlewaretoken' not in html:
+        return html
+    value = b'value="' + token.encode('utf-8') + b'"'
+    return _CSRF_INPUT_BYTES.sub(
+        lambda match: _CSRF_VALUE_BYTES.sub(lambda _: value, match.group(0),
+                                            count=1),
+        html)
+
+
+_CHARSET = re.compile(r'charset=([\w-]+)', re.I)
+
+
+def _query_bytes(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    elif isinstance(value, (bytes, bytearray)):
+        return value
+    return str(value).encode('utf-8')
+
+
+def _freeze(value, strict=False):
+    if isinstance(value, dict):
+        return frozenset((_freeze(k, strict), _freeze(v, strict))
+                         for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(v, strict) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v, strict) for v in value)
+    elif strict:
+        # Only values that render the same whenever they compare equal.
+        if not isinstance(value, _STABLE_TYPES):
+            raise TypeError(
+                "{!r} can't be used in a cache key".format(type(value)))
+        return (type(value), value)
+    hash(value)
+    return value
+
+
+_STABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+@functools.lru_cache(maxsize=256)
+def _load_template(template):
+    from django.template.loader import get_template, select_template
+    if isinstance(template, tuple):
+        return select_template(template)
+    return get_template(template)
+
+
+@receiver(setting_changed)
+def _clear_template_cache(setting, **kwargs):
+    if setting == 'TEMPLATES':
+        _load_template.cache_clear()
+        _content_cache.clear()
+
+
+def _expand_requests(requests, matrix, defaults):
+    requests = list(requests)
+    if matrix:
+        names = list(matrix.keys())
+        requests.extend(dict(zip(names, values)) for values in
+                        itertools.product(*(matrix[n] for n in names)))
+
+    expanded = []
+    for params in requests:
+        request_kwargs = defaults.copy()
+        request_kwargs.update(params)
+        expanded.append(request_kwargs)
+    return expanded
+
+
+def _request_in_process(params):
+    global _worker_pid
+
+    if _worker_pid != os.getpid():
+        # The forked worker inherits the parent's database connections. They
+        # are kept alive, but unused, so the worker opens its own.
+        _worker_pid = os.getpid()
+        for conn in connections.all():
+            _inherited_connections.append(conn.connection)
+            conn.connection = None
+
+    return _worker_case.request(**params)
+
+
+def _force_authenticate(request, user):
+    from rest_framework.test import force_authenticate
+    force_authenticate(request, user)
+
+
+class _RequestTemplate:
+    """
+    A request built through the request factory once, with the request meta
+    and session store of a test case class. ``clone`` creates requests from
+    copies of its environ and session without going through the factory.
+    """
+    request_keys = ('REQUEST_METHOD', 'PATH_INFO', 'QUERY_STRING',
+                    'CONTENT_TYPE', 'CONTENT_LENGTH', 'wsgi.input')
+
+    def __init__(self, factory, request_meta, session_store):
+        request = factory.generic('GET', '/', **request_meta)
+        self.environ = dict(request.environ)
+        self.request_class = type(request)
+        plain = self.request_class(dict(request.environ))
+        # Attributes the factory sets on top of the request class, like
+        # APIRequestFactory's _dont_enforce_csrf_checks.
+        self.attrs = {name: value for name, value in request.__dict__.items()
+                      if name not in plain.__dict__}
+        self.overrides = {key: value for key, value in request_meta.items()
+                          if key in self.request_keys}
+        self.payload_class = import_string('django.test.client.FakePayload')
+        self.session = session_store()
+
+    def clone(self, method, query, body=b'', content_type=None):
+        environ = self.environ.copy()
+        environ['REQUEST_METHOD'] = method
+        environ['QUERY_STRING'] = query
+        if isinstance(body, MultipartEncoder):
+            environ['wsgi.input'] = body
+            length = body.length
+        else:
+            environ['wsgi.input'] = self.payload_class(body)
+            length = len(body)
+        if length:
+            environ['CONTENT_LENGTH'] = str(length)
+            environ['CONTENT_TYPE'] = content_type
+
+        request = self.request_class(environ)
+        request.__dict__.update(self.attrs)
+        if self.overrides:
+            request.META.update(self.overrides)
+        request.session = copy.copy(self.session)
+        return request
+
+
+class _lazy_import:
+    def __init__(self, path):
+        self.path = path
+
+    def __get__(self, instance, owner):
+        return import_string(self.path)
+
+
+class _Dispatch:
+    __slots__ = ('response',)
+
+
+_missing = object()
+
+_worker_case = None
+_worker_pid = None
+_inherited_connections = []
+_view_cache = weakref.WeakKeyDictionary()
+_request_templates = weakref.WeakKeyDictionary()
+_REQUEST_TEMPLATE_CACHE_SIZE = 32
+_content_cache = weakref.WeakKeyDictionary()
 
 
 class ViewTestCase:
-    request_factory = RequestFactory
+    request_factory = _lazy_import('django.test.RequestFactory')
+    cache_view = True
+    cache_request = True
+    content_digest_algorithm = 'sha256'
+    session_engine = 'skivvy.sessions'
+    expected_content_cache_size = 128
+    capture_queries = False
+    max_queries = None
+    query_databases = ('default',)
+    trace_memory = False
+    max_request_memory = None
+    memory_top_allocations = 0
+    profile_requests = False
+    profile_dir = 'profiles'
+    profile_threshold = None
+    profile_top = 20
+    snapshot_dir = None
+    fixed_csrf_token = None
+    update_snapshots = False
+
+    @classmethod
+    def setUpTestData(cls):
+        if hasattr(super(), 'setUpTestData'):
+            super().setUpTestData()
+
+        if hasattr(cls, 'setup_class_models'):
+            before = dict(cls.__dict__)
+            cls.setup_class_models()
+            cls._class_model_attrs = tuple(
+                name for name, value in cls.__dict__.items()
+                if before.get(name, _missing) is not value)
 
     def setUp(self):
         super().setUp()
 
+        if hasattr(self, 'setup_class_models'):
+            if '_class_model_attrs' in type(self).__dict__:
+                self._copy_class_models()
+            else:
+                # Without TestCase's class-wide transaction, for instance in
+                # a TransactionTestCase, class data can't be shared.
+                self.setup_class_models()
+
         if hasattr(self, 'setup_models'):
             self.setup_models()
 
-    def request(self, method='GET', user=AnonymousUser(), url_kwargs={},
+    def _copy_class_models(self):
+        memo = {}
+        for name in type(self)._class_model_attrs:
+            value = getattr(type(self), name)
+            try:
+                value = copy.deepcopy(value, memo)
+            except TypeError:
+                if hasattr(value, 'refresh_from_db'):
+                    value = type(value)._default_manager.get(pk=value.pk)
+            setattr(self, name, value)
+
+    def request(self, method='GET', user=None, url_kwargs={},
                 post_data={}, get_data={}, view_kwargs={}, request_meta={},
-                session_data={}):
+                session_data={},
+                content_type='application/x-www-form-urlencoded'):
         kwargs = locals()
         del kwargs['self']
         self._request, response = self._make_request(**kwargs)
+        return self._make_response(self._request, response)
+
+    def request_many(self, requests=(), matrix=None, workers=None,
+                     pool='thread', **kwargs):
+        requests = _expand_requests(requests, matrix, kwargs)
+        self._request_defaults = self._get_request_defaults()
+        try:
+            if workers is None:
+                return [self.request(**params) for params in requests]
+            return self._request_parallel(requests, workers, pool)
+        finally:
+            del self._request_defaults
+
+    def benchmark_view(self, iterations=100, warmup=10, disable_gc=False,
+                       **kwargs):
+        def send():
+            response = self.request(**kwargs)
+            if response.raw_content is None:
+                response.stream.consume()
+
+        self._request_defaults = self._get_request_defaults()
+        try:
+            return run_benchmark(send, iterations, warmup=warmup,
+                                 disable_gc=disable_gc)
+        finally:
+            del self._request_defaults
 
+    async def async_request(self, method='GET', user=None,
+                            url_kwargs={}, post_data={}, get_data={},
+                            view_kwargs={}, request_meta={}, session_data={},
+                            content_type='application/x-www-form-urlencoded'):
+        kwargs = locals()
+        del kwargs['self']
+        self._request, response = await self._make_async_request(**kwargs)
+        return self._make_response(self._request, response)
+
+    async def async_request_many(self, requests=(), matrix=None, **kwargs):
+        requests = _expand_requests(requests, matrix, kwargs)
+        self._request_defaults = self._get_request_defaults()
+        try:
+            if self._uses_probes():
+                # Probes measure one request at a time.
+                responses = []
+                for params in requests:
+                    responses.append(await self.async_request(**params))
+                return responses
+            return await self._gather_requests(requests)
+        finally:
+            del self._request_defaults
+
+    async def _gather_requests(self, requests):
+        import asyncio
+        tasks = [asyncio.ensure_future(self.async_request(**params))
+                 for params in requests]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other requests running after the batch.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def _request_parallel(self, requests, workers, pool):
+        global _worker_case
+
+        if pool == 'thread':
+            if self.trace_memory or self.max_request_memory is not None:
+                raise ImproperlyConfigured(
+                    "request_many() can't trace memory of requests sent by a "
+                    "thread pool, because tracemalloc traces the whole "
+                    "process; use pool='process' instead")
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._request_in_thread,
+                                            requests))
+            if results:
+                # Leave the test case as if the requests had been sent one
+                # after the other.
+                last_case = results[-1][1]
+                for name in ('_request', 'messages', 'content_type'):
+                    if name in last_case.__dict__:
+                        setattr(self, name, getattr(last_case, name))
+            return [response for response, case in results]
+        elif pool == 'process':
+            if multiprocessing.get_start_method() != 'fork':
+                raise ImproperlyConfigured(
+                    "request_many() requires the 'fork' start method to run "
+                    "requests in a process pool")
+
+            _worker_case = self
+            try:
+                with futures.ProcessPoolExecutor(
+                        max_workers=workers) as executor:
+                    return list(executor.map(_request_in_process, requests))
+            finally:
+                _worker_case = None
+        else:
+            raise ImproperlyConfigured(
+                "request_many() supports pool='thread' or pool='process', "
+                "got {!r}".format(pool))
+
+    def _request_in_thread(self, params):
+        # Each request is sent from a shallow copy of the test case, so the
+        # state it sets, like _request, isn't overwritten by other workers.
+        case = copy.copy(self)
+        try:
+            response = case.request(**params)
+            # Load the lazy fields while still in the worker.
+            tuple(response)
+            return response, case
+        finally:
+            connections.close_all()
+
+    def _make_response(self, request, response):
+        skivvy_response = Response(
+            status_code=response.status_code,
+            location=response.get('location', None),
+            queries=getattr(response, 'captured_queries', None),
+            timings=_get_timings(response),
+            memory_peak=getattr(response, 'memory_peak', None),
+            memory_net=getattr(response, 'memory_net', None),
+            loaders={
+                'content': lambda: self._get_content(response),
+                'messages': lambda: self._get_messages(request),
+                'headers': lambda: self._get_headers(response),
+                'raw_content': lambda: self._get_raw_content(response),
+                'stream': lambda: self._get_stream(response),
+            }
+        )
+        request_dispatched.send(sender=type(self), test_case=self,
+                                response=skivvy_response)
+        return skivvy_response
+
+    def _get_content(self, response):
+        timings = _get_timings(response)
         content_disp = response._headers.get('content-disposition')
-        content = None
         if hasattr(response, 'render'):
-            content = remove_csrf(response.render().content.decode('utf-8'))
+            with timings.phase('render'):
+                response.render()
+            content = response.content
+            if not getattr(response, 'csrf_token_fixed', False):
+                with timings.phase('csrf'):
+                    if self.fixed_csrf_token is not None:
+                        content = _replace_csrf_token(content,
+                                                      self.fixed_csrf_token)
+                    else:
+                        content = remove_csrf(content)
+            with timings.phase('decode'):
+                return content.decode('utf-8')
         elif (hasattr(response, 'content') and
               not (content_disp and 'attachment' in content_disp[1])):
-            content = response.content.decode('utf-8')
+            with timings.phase('decode'):
+                return response.content.decode('utf-8')
 
-        return Response(
-            status_code=response.status_code,
-            content=content,
-            location=response.get('location', None),
-            messages=[str(m) for m in get_messages(self._request)],
-            headers=response._headers
-        )
+    def _get_messages(self, request):
+        from django.contrib.messages.api import get_messages
+        return [str(m) for m in get_messages(request)]
 
-    def _make_request(self, method='GET', user=AnonymousUser(), url_kwargs={},
-                      get_data={}, post_data={}, request_meta={},
-                      view_kwargs={}, auth_func=None,
-                      content_type='application/x-www-form-urlencoded',
-                      session_data={}):
-        self.content_type = content_type
-        url_params = self._get_url_params(get_data)
-        url = '/?' + url_params if url_params else '/'
-
-        if method in ['POST', 'PATCH', 'PUT']:
-            post_data = self._get_post_data(post_data,
-                                            content_type=content_type)
-
-        req = getattr(self.request_factory(), method.lower())
-        request = req(url, post_data, content_type=self.content_type)
-        request.META.update(self._get_request_meta(request_meta))
-
-        if isinstance(self, ViewTestCase):
-            setattr(request, 'session', SessionStore())
-            self.messages = FallbackStorage(request)
-            setattr(request, '_messages', self.messages)
-            for k, v in session_data.items():
-                request.session[k] = v
-
-        if auth_func:
-            auth_func(request, user)
-        else:
-            setattr(request, 'user', user)
+    def _get_raw_content(self, response):
+        if getattr(response, 'streaming', False):
+            return None
+        if hasattr(response, 'render'):
+            with _get_timings(response).phase('render'):
+                response.render()
+        return response.content
+
+    def _get_stream(self, response):
+        if getattr(response, 'streaming', False):
+            return ContentStream(response.streaming_content,
+                                 algorithm=self.content_digest_algorithm,
+                                 close=response.close)
+
+        if hasattr(response, 'render'):
+            response.render()
+        return ContentStream([response.content],
+                             algorithm=self.content_digest_algorithm)
+
+    def _get_headers(self, response):
+        if hasattr(response, 'render'):
+            response.render()
+        return response._headers
+
+    def _make_request(self, **kwargs):
+        timings = Timings()
+        request, view, url_params = self._prepare_request(timings=timings,
+                                                          **kwargs)
+        with self._dispatch(timings) as dispatch:
+            with timings.phase('dispatch'):
+                dispatch.response = view(request, **url_params)
+        return request, dispatch.response
+
+    async def _make_async_request(self, **kwargs):
+        timings = Timings()
+        request, view, url_params = self._prepare_request(timings=timings,
+                                                          **kwargs)
+        with self._dispatch(timings) as dispatch:
+            with timings.phase('dispatch'):
+                response = view(request, **url_params)
+                if inspect.isawaitable(response):
+                    response = await response
+            dispatch.response = response
+        return request, dispatch.response
+
+    @contextmanager
+    def _dispatch(self, timings):
+        """
+        Runs the probes around the view call in the ``with`` block, which
+        stores the view's response as ``response``. The response is
+        rendered while the probes are still running.
+        """
+        dispatch = _Dispatch()
+        probes = self._get_probes()
+        with ExitStack() as stack:
+            for probe in probes:
+                stack.enter_context(probe)
+            yield dispatch
+            response = dispatch.response
+            self._fix_csrf_token(response)
+            if probes and hasattr(response, 'render'):
+                with timings.phase('render'):
+                    response.render()
+
+        for probe in probes:
+            probe.finish(response)
+        response.timings = timings
+
+    def _fix_csrf_token(self, response):
+        if (self.fixed_csrf_token is None or
+                getattr(response, 'is_rendered', True) or
+                getattr(response, 'template_name', None) is None):
+            return
+
+        context = response.context_data
+        if context is None:
+            context = {}
+        elif not isinstance(context, dict):
+            return
+        # Values from the context override those of context processors,
+        # so the csrf_token tag renders this instead of a random token.
+        response.context_data = dict(context,
+                                     csrf_token=self.fixed_csrf_token)
+        response.csrf_token_fixed = True
+
+    def _uses_probes(self):
+        return (self.capture_queries or self.max_queries is not None or
+                self._should_profile() or self.trace_memory or
+                self.max_request_memory is not None)
+
+    def _get_probes(self):
+        probes = []
+        if self.capture_queries or self.max_queries is not None:
+            probes.append(QueryProbe(max_queries=self.max_queries,
+                                     using=self.query_databases))
+        if self._should_profile():
+            probes.append(ProfileProbe(self._get_profile_path(),
+                                       threshold=self.profile_threshold,
+                                       top=self.profile_top))
+        if self.trace_memory or self.max_request_memory is not None:
+            # Added last, so the other probes' bookkeeping isn't counted.
+            probes.append(MemoryProbe(
+                max_memory=self.max_request_memory,
+                top_allocations=self.memory_top_allocations))
+        return probes
+
+    def _should_profile(self):
+        env = os.environ.get('SKIVVY_PROFILE', '')
+        return self.profile_requests or env.lower() in ('1', 'true', 'yes')
+
+    def _get_profile_path(self):
+        calls = self.__dict__.setdefault('_profile_calls', {})
+        test_id = self.id()
+        calls[test_id] = calls.get(test_id, 0) + 1
+        name = re.sub(r'[^\w.-]', '_', test_id)
+        return os.path.join(self.profile_dir,
+                            '{}-{}.pstats'.format(name, calls[test_id]))
+
+    def _prepare_request(self, method='GET', user=None,
+                         url_kwargs={}, get_data={}, post_data={},
+                         request_meta={}, view_kwargs={}, auth_func=None,
+                         content_type='application/x-www-form-urlencoded',
+                         session_data={}, timings=None):
+        if timings is None:
+            timings = Timings()
+
+        defaults = getattr(self, '_request_defaults', None)
+        if defaults is None:
+            with timings.phase('defaults'):
+                defaults = self._get_request_defaults()
+
+        with timings.phase('encode'):
+            query = self._url_encode_data(
+                self._merge_data(defaults['get_data'], get_data))
+
+            if method in ['POST', 'PATCH', 'PUT']:
+                post_data, content_type = self._encode_post_data(
+                    self._merge_data(defaults['post_data'], post_data),
+                    content_type=content_type)
+            self.content_type = content_type
+
+        with timings.phase('request'):
+            request_meta = self._merge_data(defaults['request_meta'],
+                                            request_meta)
+            request = self._clone_request(defaults, request_meta, method,
+                                          query, post_data, content_type)
+            if request is None:
+                url = '/?' + query if query else '/'
+                req = getattr(defaults['factory'], method.lower())
+                request = req(url, post_data, content_type=content_type)
+                request.META.update(request_meta)
+
+        with timings.phase('session'):
+            if isinstance(self, ViewTestCase):
+                if not hasattr(request, 'session'):
+                    request.session = defaults['session_store']()
+                self.messages = defaults['messages_storage'](request)
+                setattr(request, '_messages', self.messages)
+                for k, v in session_data.items():
+                    request.session[k] = v
+
+            if user is None:
+                user = defaults['anonymous_user']()
+
+            if auth_func:
+                auth_func(request, user)
+            else:
+                setattr(request, 'user', user)
+
+        url_params = self._merge_data(defaults['url_kwargs'], url_kwargs)
+        view = self._get_view(view_kwargs, defaults['views'])
+
+        return request, view, url_params
+
+    def _clone_request(self, defaults, request_meta, method, query,
+                       body, content_type):
+        # Other methods and bodies the factory still has to encode go
+        # through the request factory.
+        if method in ('GET', 'HEAD'):
+            body = b''
+        elif method not in ('POST', 'PATCH', 'PUT'):
+            return None
+        elif isinstance(body, str):
+            match = _CHARSET.search(content_type or '')
+            body = body.encode(match.group(1) if match
+                               else settings.DEFAULT_CHARSET)
+        elif not isinstance(body, (bytes, MultipartEncoder)):
+            return None
 
-        url_params = self._get_url_kwargs(url_kwargs)
-        view = self.setup_view(view_kwargs=view_kwargs)
+        template = self._get_request_template(defaults, request_meta)
+        if template is None:
+            if not isinstance(body, MultipartEncoder):
+                return None
+            template = _RequestTemplate(defaults['factory'], request_meta,
+                                        defaults['session_store'])
+        return template.clone(method, query, body, content_type)
 
-        response = view(request, **url_params)
+    def _get_request_template(self, defaults, request_meta):
+        if not self.cache_request:
+            return None
 
-        return request, response
+        try:
+            key = (type(defaults['factory']),
+                   _freeze(request_meta, strict=True),
+                   defaults['session_store'])
+        except TypeError:
+            return None
+
+        templates = _request_templates.setdefault(type(self), OrderedDict())
+        if key in templates:
+            templates.move_to_end(key)
+            return templates[key]
+
+        template = _RequestTemplate(defaults['factory'], request_meta,
+                                    defaults['session_store'])
+        templates[key] = template
+        if len(templates) > _REQUEST_TEMPLATE_CACHE_SIZE:
+            templates.popitem(last=False)
+        return template
+
+    def _get_request_defaults(self):
+        return {
+            'factory': self.request_factory(),
+            'get_data': self._get_default_get_data(),
+            'post_data': self._get_default_post_data(),
+            'url_kwargs': self._get_default_url_kwargs(),
+            'request_meta': self._get_default_request_meta(),
+            'session_store': self._get_session_store(),
+            'messages_storage': import_string(
+                'django.contrib.messages.storage.fallback.FallbackStorage'),
+            'anonymous_user': import_string(
+                'django.contrib.auth.models.AnonymousUser'),
+            'views': {},
+        }
+
+    def _get_session_store(self):
+        engine = self.session_engine or settings.SESSION_ENGINE
+        return import_module(engine).SessionStore
+
+    def _get_view(self, view_kwargs, views):
+        try:
+            key = _freeze(view_kwargs)
+        except TypeError:
+            return self.setup_view(view_kwargs=view_kwargs)
+
+        if key not in views:
+            views[key] = self.setup_view(view_kwargs=view_kwargs)
+        return views[key]
 
     def setup_view(self, view_kwargs={}):
         if not hasattr(self, 'view_class'):
@@ -104,6 +875,25 @@ class ViewTestCase:
                 "ViewTestCase requires either a definition of "
                 "'view_class' or an implementation of 'setup_view()'")
 
+        if not self.cache_view:
+            return self._build_view(view_kwargs)
+
+        viewset_actions = getattr(self, 'viewset_actions', None)
+        try:
+            key = (_freeze(viewset_actions), _freeze(view_kwargs))
+        except TypeError:
+            return self._build_view(view_kwargs)
+
+        view_class, views = _view_cache.get(type(self), (None, None))
+        if view_class is not self.view_class:
+            views = {}
+            _view_cache[type(self)] = (self.view_class, views)
+
+        if key not in views:
+            views[key] = self._build_view(view_kwargs)
+        return views[key]
+
+    def _build_view(self, view_kwargs):
         if hasattr(self, 'viewset_actions'):
             return self.view_class.as_view(self.viewset_actions, **view_kwargs)
         else:
@@ -113,37 +903,45 @@ class ViewTestCase:
         return self._url_encode_data(self._get_get_data(data=data))
 
     def _get_get_data(self, data={}):
-        get_data = {}
+        return self._merge_data(self._get_default_get_data(), data)
+
+    def _get_default_get_data(self):
         if hasattr(self, 'setup_get_data'):
-            get_data = self.setup_get_data()
+            return self.setup_get_data()
         elif hasattr(self, 'get_data'):
-            get_data = self.get_data.copy()
-
-        get_data.update(data)
-        return get_data
+            return self.get_data
+        return {}
 
     def _get_post_data(self, data={}, content_type=None):
-        post_data = {}
+        post_data, self.content_type = self._encode_post_data(
+            self._merge_data(self._get_default_post_data(), data),
+            content_type=content_type)
+        return post_data
+
+    def _get_default_post_data(self):
         if hasattr(self, 'setup_post_data'):
-            post_data = self.setup_post_data()
+            return self.setup_post_data()
         elif hasattr(self, 'post_data'):
-            post_data = self.post_data.copy()
-
-        post_data.update(data)
+            return self.post_data
+        return {}
 
+    def _encode_post_data(self, post_data, content_type=None):
         if content_type == 'application/x-www-form-urlencoded':
             post_data = self._url_encode_data(post_data)
-        return post_data
+        elif content_type == 'multipart/form-data':
+            post_data = MultipartEncoder(post_data)
+            content_type = post_data.content_type
+        return post_data, content_type
 
     def _get_url_kwargs(self, add_args={}):
-        url_kwargs = {}
+        return self._merge_data(self._get_default_url_kwargs(), add_args)
+
+    def _get_default_url_kwargs(self):
         if hasattr(self, 'setup_url_kwargs'):
-            url_kwargs = self.setup_url_kwargs()
+            return self.setup_url_kwargs()
         elif hasattr(self, 'url_kwargs'):
-            url_kwargs = self.url_kwargs.copy()
-
-        url_kwargs.update(add_args)
-        return url_kwargs
+            return self.url_kwargs
+        return {}
 
     def _get_template(self):
         if hasattr(self, 'setup_template'):
@@ -164,27 +962,122 @@ class ViewTestCase:
             return {}
 
     def _get_request_meta(self, add_meta={}):
-        request_meta = {}
+        return self._merge_data(self._get_default_request_meta(), add_meta)
+
+    def _get_default_request_meta(self):
         if hasattr(self, 'setup_request_meta'):
-            request_meta = self.setup_request_meta()
+            return self.setup_request_meta()
         elif hasattr(self, 'request_meta'):
-            request_meta = self.request_meta
-
-        request_meta.update(add_meta)
-        return request_meta
+            return self.request_meta
+        return {}
 
     def render_content(self, **context_kwargs):
         template = self._get_template()
-        context = self._get_template_context()
-        context.update(context_kwargs)
+        if isinstance(template, list):
+            template = tuple(template)
+        context = self._merge_data(self._get_template_context(),
+                                   context_kwargs)
+
+        try:
+            key = (template, _freeze(context, strict=True))
+        except TypeError:
+            return self._render_content(template, context)
+
+        # Content is rendered with the request, so it is cached per request
+        # and dropped with it.
+        cache = _content_cache.setdefault(self._request, OrderedDict())
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        html = self._render_content(template, context)
+        if self.expected_content_cache_size:
+            cache[key] = html
+            if len(cache) > self.expected_content_cache_size:
+                cache.popitem(last=False)
+        return html
 
-        html = render_to_string(template, context, request=self._request)
+    def _render_content(self, template, context):
+        if self.fixed_csrf_token is not None:
+            context = dict(context, csrf_token=self.fixed_csrf_token)
+            return _load_template(template).render(context,
+                                                   request=self._request)
+        html = _load_template(template).render(context, request=self._request)
         return remove_csrf(html)
 
     @property
     def expected_content(self):
         return self.render_content()
 
+    def assert_html_equal(self, response, expected=None):
+        if expected is None:
+            expected = self.expected_content
+        difference = compare_html(parse_expected_html(expected),
+                                  self._get_html_chunks(response))
+        if difference is not None:
+            raise AssertionError(str(difference))
+
+    def _get_html_chunks(self, response, chunk_size=16384):
+        if isinstance(response, Response):
+            if response.content is None:
+                decoder = getincrementaldecoder('utf-8')()
+                for chunk in response.chunks:
+                    yield decoder.decode(chunk)
+                yield decoder.decode(b'', final=True)
+                return
+            response = response.content
+        for start in range(0, len(response), chunk_size):
+            yield response[start:start + chunk_size]
+
+    def assert_matches_snapshot(self, response, name=None):
+        if name is None:
+            calls = self.__dict__.setdefault('_snapshot_calls', {})
+            test_id = self.id()
+            calls[test_id] = calls.get(test_id, 0) + 1
+            name = '{}:{}'.format(test_id, calls[test_id])
+
+        content = self._get_snapshot_content(response)
+        store = get_store(self._get_snapshot_dir())
+        digest = store.get(name)
+        if digest == store.digest(content):
+            return
+
+        if self._should_update_snapshots():
+            store.write(name, content)
+        elif digest is None:
+            raise AssertionError(
+                "No snapshot '{}' found. Set SKIVVY_UPDATE_SNAPSHOTS=1 to "
+                "create it.".format(name))
+        else:
+            raise AssertionError(
+                "Response does not match snapshot '{}':\n{}".format(
+                    name, diff_snapshot(store.read(digest), content, name)))
+
+    def _get_snapshot_content(self, response):
+        content = response
+        if isinstance(response, Response):
+            content = response.content
+            if content is None:
+                content = b''.join(response.chunks)
+
+        if isinstance(content, str):
+            content = remove_csrf(content).encode('utf-8')
+        elif not isinstance(content, (bytes, bytearray)):
+            content = json.dumps(content, indent=2, sort_keys=True,
+                                 ensure_ascii=False, default=str)
+            content = content.encode('utf-8')
+        return bytes(content)
+
+    def _get_snapshot_dir(self):
+        if self.snapshot_dir is not None:
+            return self.snapshot_dir
+        return os.path.join(os.path.dirname(inspect.getfile(type(self))),
+                            'snapshots')
+
+    def _should_update_snapshots(self):
+        env = os.environ.get('SKIVVY_UPDATE_SNAPSHOTS', '')
+        return self.update_snapshots or env.lower() in ('1', 'true', 'yes')
+
     def _get_success_url_kwargs(self):
         if hasattr(self, 'setup_success_url_kwargs'):
             return self.setup_success_url_kwargs()
@@ -197,6 +1090,7 @@ class ViewTestCase:
         if hasattr(self, 'success_url'):
             return self.success_url
         elif hasattr(self, 'success_url_name'):
+            from django.urls import reverse
             url_kwargs = self._get_success_url_kwargs()
 
             return reverse(self.success_url_name, kwargs=url_kwargs)
@@ -210,43 +1104,92 @@ class ViewTestCase:
     def expected_success_url(self):
         return self.get_success_url()
 
+    @staticmethod
+    def _merge_data(defaults, data):
+        # Multi-value dicts are flattened into dicts of lists, so merging
+        # replaces values by key rather than appending to them.
+        if hasattr(defaults, 'lists'):
+            merged = dict(defaults.lists())
+        else:
+            merged = defaults.copy()
+        merged.update(data.lists() if hasattr(data, 'lists') else data)
+        return merged
+
     @staticmethod
     def _url_encode_data(data):
-        return '&'.join(['{}={}'.format(k, parse.quote_plus(str(v)))
-                        for k, v in data.items()])
+        items = data.lists() if hasattr(data, 'lists') else data.items()
+        keys = []
+        values = []
+        for key, value in items:
+            key = _query_bytes(key)
+            if isinstance(value, (list, tuple)):
+                keys.extend([key] * len(value))
+                values.extend(value)
+            else:
+                keys.append(key)
+                values.append(value)
+        pairs = [k + b'=' + _query_bytes(v) for k, v in zip(keys, values)]
+
+        # Quote the whole query in one call, unless a key or value contains
+        # a separator that would then be left unquoted.
+        query = b'&'.join(pairs)
+        if (query.count(b'=') == len(pairs) and
+                query.count(b'&') == max(len(pairs) - 1, 0)):
+            return parse.quote_from_bytes(query, '&= ').replace(' ', '+')
+        return '&'.join([parse.quote_plus(k) + '=' +
+                         parse.quote_plus(_query_bytes(v))
+                         for k, v in zip(keys, values)])
 
 
 class APITestCase(ViewTestCase):
-    request_factory = APIRequestFactory
+    request_factory = _lazy_import('rest_framework.test.APIRequestFactory')
+    json_codec = 'auto'
+    use_response_data = False
 
     def _get_post_data(self, post_data={}, content_type='application/json'):
-        post_data = super()._get_post_data(post_data)
+        return super()._get_post_data(post_data, content_type=content_type)
+
+    def _encode_post_data(self, post_data, content_type='application/json'):
         if content_type == 'multipart/form-data':
-            self.content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
-            post_data = encode_multipart('BoUnDaRyStRiNg', post_data)
+            return super()._encode_post_data(post_data, content_type)
+        post_data = self._get_json_codec().dumps(post_data)
+        return post_data, content_type
 
-        else:
-            post_data = json.dumps(post_data).encode()
-        return post_data
+    def _get_json_codec(self):
+        if isinstance(self.json_codec, str):
+            return get_json_codec(self.json_codec)
+        return self.json_codec
 
-    def request(self, method='GET', user=AnonymousUser(), url_kwargs={},
+    def request(self, method='GET', user=None, url_kwargs={},
                 post_data={}, get_data={}, content_type='application/json',
                 request_meta={}, view_kwargs={}):
         kwargs = locals()
         del kwargs['self']
         self._request, response = self._make_request(
-            auth_func=force_authenticate, **kwargs)
+            auth_func=_force_authenticate, **kwargs)
+        return self._make_response(self._request, response)
 
-        content = response.render().content.decode('utf-8')
-        if 'application/json' in response._headers.get('content-type', ()):
-            content = json.loads(content)
-        elif 'application/xml' in response._headers.get('content-type', ()):
-            content = response.data
+    async def async_request(self, method='GET', user=None,
+                            url_kwargs={}, post_data={}, get_data={},
+                            content_type='application/json', request_meta={},
+                            view_kwargs={}):
+        kwargs = locals()
+        del kwargs['self']
+        self._request, response = await self._make_async_request(
+            auth_func=_force_authenticate, **kwargs)
+        return self._make_response(self._request, response)
 
-        return Response(
-            status_code=response.status_code,
-            content=content,
-            location=response.get('location', None),
-            messages=[str(m) for m in get_messages(self._request)],
-            headers=response._headers
-        )
+    def _get_content(self, response):
+        if self.use_response_data and hasattr(response, 'data'):
+            return response.data
+
+        timings = _get_timings(response)
+        with timings.phase('render'):
+            response.render()
+        content_type = response._headers.get('content-type', ())
+        with timings.phase('decode'):
+            if 'application/json' in content_type:
+                return self._get_json_codec().loads(response.content)
+            elif 'application/xml' in content_type:
+                return response.data
+            return response.content.decode('utf-8')
@@ -0,0 +1,72 @@
+import gc
+import math
+import time
+
+
+def percentile(timings, percent):
+    """
+    Nearest-rank percentile of ``timings``, which must be sorted.
+    """
+    index = max(0, math.ceil(percent * len(timings) / 100) - 1)
+    return timings[index]
+
+
+class BenchmarkResult:
+    def __init__(self, timings, duration):
+        self.timings = sorted(timings)
+        self.iterations = len(timings)
+        self.duration = duration
+
+    @property
+    def requests_per_second(self):
+        return self.iterations / self.duration
+
+    @property
+    def mean(self):
+        return sum(self.timings) / self.iterations
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    def percentile(self, percent):
+        return percentile(self.timings, percent)
+
+    def __repr__(self):
+        return ('<BenchmarkResult {} requests, {:.1f} req/s, p50 {:.3f}ms, '
+                'p95 {:.3f}ms, p99 {:.3f}ms>'.format(
+                    self.iterations, self.requests_per_second,
+                    self.p50 * 1000, self.p95 * 1000, self.p99 * 1000))
+
+
+def run_benchmark(func, iterations, warmup=0, disable_gc=False):
+    if iterations < 1:
+        raise ValueError('iterations must be at least 1')
+
+    for _ in range(warmup):
+        func()
+
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    if disable_gc:
+        gc.disable()
+    try:
+        timings = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            request_start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - request_start)
+        duration = time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return BenchmarkResult(timings, duration)
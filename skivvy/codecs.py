@@ -0,0 +1,55 @@
+import functools
+import json
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class JSONCodec:
+    def dumps(self, data):
+        return json.dumps(data).encode()
+
+    def loads(self, data):
+        if isinstance(data, bytes) and sys.version_info < (3, 6):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """
+    Falls back to the json module for data orjson can't handle, like
+    integers beyond 64 bits or NaN literals.
+    """
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        self.fallback = JSONCodec()
+
+    def dumps(self, data):
+        try:
+            return self.orjson.dumps(data,
+                                     option=self.orjson.OPT_NON_STR_KEYS)
+        except self.orjson.JSONEncodeError:
+            return self.fallback.dumps(data)
+
+    def loads(self, data):
+        try:
+            return self.orjson.loads(data)
+        except self.orjson.JSONDecodeError:
+            return self.fallback.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def get_json_codec(name='auto'):
+    if name == 'auto':
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            return JSONCodec()
+    elif name == 'orjson':
+        return OrjsonCodec()
+    elif name == 'json':
+        return JSONCodec()
+    raise ImproperlyConfigured(
+        "Unknown JSON codec {!r}; use 'auto', 'json' or 'orjson'".format(name))
@@ -0,0 +1,152 @@
+import functools
+import re
+from html.parser import HTMLParser
+
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class EventParser(HTMLParser):
+    """
+    Parses HTML into a flat list of normalized ``start``, ``end`` and
+    ``text`` events. Attributes are sorted, whitespace is collapsed and
+    whitespace-only text is dropped, so documents that only differ in
+    formatting produce the same events.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        self.events.append(('start', tag, _normalize_attrs(attrs)))
+        if tag in VOID_ELEMENTS:
+            self.events.append(('end', tag))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.events.append(('end', tag))
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_ELEMENTS:
+            self._flush_text()
+            self.events.append(('end', tag))
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+    def _flush_text(self):
+        if self._text:
+            text = _WHITESPACE.sub(' ', ''.join(self._text)).strip()
+            self._text = []
+            if text:
+                self.events.append(('text', text))
+
+
+def _normalize_attrs(attrs):
+    normalized = []
+    for name, value in attrs:
+        if value is None:
+            value = name
+        elif name == 'class':
+            value = ' '.join(sorted(value.split()))
+        normalized.append((name, value))
+    return tuple(sorted(normalized))
+
+
+def parse_html(html):
+    parser = EventParser()
+    parser.feed(html)
+    parser.close()
+    return tuple(parser.events)
+
+
+@functools.lru_cache(maxsize=128)
+def parse_expected_html(html):
+    return parse_html(html)
+
+
+class HTMLDifference:
+    def __init__(self, path, expected, actual):
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return 'HTML differs at {}:\n  expected: {}\n  actual:   {}'.format(
+            self.path, format_event(self.expected), format_event(self.actual))
+
+
+def format_event(event):
+    if event is None:
+        return 'end of document'
+    elif event[0] == 'start':
+        attrs = ''.join(' {}="{}"'.format(name, value)
+                        for name, value in event[2])
+        return '<{}{}>'.format(event[1], attrs)
+    elif event[0] == 'end':
+        return '</{}>'.format(event[1])
+    return repr(event[1])
+
+
+class _NodePath:
+    def __init__(self):
+        self.stack = []
+        self.counts = [{}]
+
+    def update(self, event):
+        if event[0] == 'start':
+            counts = self.counts[-1]
+            counts[event[1]] = counts.get(event[1], 0) + 1
+            self.stack.append((event[1], counts[event[1]]))
+            self.counts.append({})
+        elif event[0] == 'end' and self.stack:
+            self.stack.pop()
+            self.counts.pop()
+
+    def __str__(self):
+        return '/' + '/'.join('{}[{}]'.format(tag, n)
+                              for tag, n in self.stack)
+
+
+def compare_html(expected, chunks):
+    """
+    Compares the ``expected`` events with the HTML in ``chunks``, an
+    iterable of strings. Chunks are parsed one at a time and parsing stops
+    at the first difference, which is returned as an ``HTMLDifference``.
+    Returns ``None`` if both documents are equal.
+    """
+    parser = EventParser()
+    path = _NodePath()
+    position = 0
+    done = False
+    chunks = iter(chunks)
+    while not done:
+        chunk = next(chunks, None)
+        if chunk is None:
+            parser.close()
+            done = True
+        else:
+            parser.feed(chunk)
+
+        for event in parser.events:
+            expected_event = (expected[position]
+                              if position < len(expected) else None)
+            if event != expected_event:
+                return HTMLDifference(str(path), expected_event, event)
+            path.update(event)
+            position += 1
+        del parser.events[:]
+
+    if position < len(expected):
+        return HTMLDifference(str(path), expected[position], None)
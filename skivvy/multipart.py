@@ -0,0 +1,181 @@
+import io
+import mimetypes
+import mmap
+import os
+import pathlib
+import uuid
+
+from django.conf import settings
+
+
+class MultipartEncoder:
+    chunk_size = 64 * 1024
+
+    def __init__(self, data, boundary=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={}'.format(
+            self.boundary)
+        self._parts = self._get_parts(data)
+        self.length = sum(len(part) for part in self._parts)
+        self._iterator = self._iterate()
+        self._buffer = b''
+
+    def __iter__(self):
+        if self._buffer:
+            yield self._buffer
+            self._buffer = b''
+        yield from self._iterator
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b''.join(self)
+
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            chunk = next(self._iterator, None)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+            length += len(chunk)
+
+        data = b''.join(chunks)
+        self._buffer = data[size:]
+        return data[:size]
+
+    def _iterate(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part.chunks(self.chunk_size)
+
+    def _get_parts(self, data):
+        parts = []
+        items = data.lists() if hasattr(data, 'lists') else data.items()
+        for key, value in items:
+            if value is None:
+                raise TypeError(
+                    'Cannot encode None as POST data. Did you mean to pass '
+                    'an empty string or omit the value?')
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                parts.append(self._encode_header(key, item))
+                parts.append(self._encode_body(key, item))
+                parts.append(b'\r\n')
+        parts.append('--{}--\r\n'.format(self.boundary).encode())
+        return parts
+
+    def _encode_header(self, key, value):
+        lines = ['--{}'.format(self.boundary)]
+        if _is_file(value):
+            filename = _get_filename(value)
+            content_type = getattr(value, 'content_type', None)
+            if content_type is None and filename:
+                content_type = mimetypes.guess_type(filename)[0]
+            filename = filename or key
+            content_type = content_type or 'application/octet-stream'
+            lines.append('Content-Disposition: form-data; name="{}"; '
+                         'filename="{}"'.format(key, filename))
+            lines.append('Content-Type: {}'.format(content_type))
+        else:
+            lines.append(
+                'Content-Disposition: form-data; name="{}"'.format(key))
+        lines.extend(['', ''])
+        return '\r\n'.join(lines).encode(settings.DEFAULT_CHARSET)
+
+    def _encode_body(self, key, value):
+        if _is_file(value):
+            return FileBody(value)
+        return str(value).encode(settings.DEFAULT_CHARSET)
+
+
+def _is_file(value):
+    return (hasattr(value, 'read') or
+            isinstance(value, (pathlib.PurePath, mmap.mmap, memoryview)))
+
+
+def _get_filename(value):
+    if isinstance(value, pathlib.PurePath):
+        return value.name
+    # The name of a tempfile.TemporaryFile() is its file descriptor.
+    name = getattr(value, 'name', None)
+    return os.path.basename(name) if isinstance(name, str) else ''
+
+
+class FileBody:
+    """
+    Body of a file part. Files on disk are memory-mapped and sliced into
+    chunks as the request is read, so uploads are never copied whole.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        if not isinstance(source, (pathlib.PurePath, mmap.mmap,
+                                   memoryview, io.BytesIO)):
+            try:
+                source.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                # Neither mappable nor buffered, so it can only be read once.
+                self.source = source.read()
+        self._length = None
+
+    def __len__(self):
+        if self._length is None:
+            with self._open() as buffer:
+                self._length = len(buffer)
+        return self._length
+
+    def chunks(self, chunk_size):
+        with self._open() as buffer:
+            for start in range(0, len(buffer), chunk_size):
+                yield bytes(buffer[start:start + chunk_size])
+
+    def _open(self):
+        source = self.source
+        if isinstance(source, pathlib.PurePath):
+            return _MappedFile(open(str(source), 'rb'), close_file=True)
+        elif isinstance(source, io.BytesIO):
+            return _Buffer(source.getbuffer(), source.tell())
+        elif isinstance(source, (bytes, mmap.mmap, memoryview)):
+            return _Buffer(memoryview(source))
+        return _MappedFile(source)
+
+
+class _Buffer:
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def __enter__(self):
+        self.view = self.buffer[self.offset:]
+        return self.view
+
+    def __exit__(self, *exc_info):
+        self.view.release()
+        self.buffer.release()
+
+
+class _MappedFile:
+    def __init__(self, file, close_file=False):
+        self.file = file
+        self.close_file = close_file
+        self.offset = file.tell()
+        self.map = None
+
+    def __enter__(self):
+        if os.fstat(self.file.fileno()).st_size == 0:
+            # Empty files can't be memory-mapped.
+            self.view = memoryview(b'')
+        else:
+            self.map = mmap.mmap(self.file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)[self.offset:]
+        return self.view
+
+    def __exit__(self, *exc_info):
+        self.view.release()
+        if self.map is not None:
+            self.map.close()
+        if self.close_file:
+            self.file.close()
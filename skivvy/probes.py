@@ -0,0 +1,167 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+
+# Connections whose queries are being captured. Each thread has its own
+# connections, so captures only overlap on one when requests are awaited
+# concurrently.
+_capturing = set()
+
+
+class QueryProbe:
+    def __init__(self, max_queries=None, using=('default',)):
+        from django.test.utils import CaptureQueriesContext
+        self.max_queries = max_queries
+        self.contexts = [CaptureQueriesContext(connections[alias])
+                         for alias in using]
+
+    def __enter__(self):
+        ids = {id(context.connection) for context in self.contexts}
+        if ids & _capturing:
+            raise ImproperlyConfigured(
+                "Queries can't be captured for requests that run at the same "
+                "time on the same database connection")
+        _capturing.update(ids)
+        try:
+            for context in self.contexts:
+                context.__enter__()
+        except BaseException:
+            _capturing.difference_update(ids)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            for context in reversed(self.contexts):
+                context.__exit__(exc_type, exc_value, traceback)
+        finally:
+            _capturing.difference_update(
+                id(context.connection) for context in self.contexts)
+
+    def finish(self, response):
+        queries = [query for context in self.contexts
+                   for query in context.captured_queries]
+        response.captured_queries = queries
+
+        if self.max_queries is not None and len(queries) > self.max_queries:
+            raise AssertionError(
+                "{} queries executed, at most {} expected\n"
+                "Captured queries were:\n{}".format(
+                    len(queries), self.max_queries,
+                    '\n'.join('{}. {}'.format(i, query['sql'])
+                              for i, query in enumerate(queries, start=1))))
+
+
+# tracemalloc traces the whole process, so only one request at a time can
+# be measured.
+_memory_lock = threading.Lock()
+
+
+class MemoryProbe:
+    def __init__(self, max_memory=None, top_allocations=0):
+        self.max_memory = max_memory
+        self.top_allocations = top_allocations
+        self.started = False
+        self.snapshot = None
+
+    def __enter__(self):
+        import tracemalloc
+        if not _memory_lock.acquire(blocking=False):
+            raise ImproperlyConfigured(
+                "Memory can't be traced for requests that run at the same "
+                "time, because tracemalloc traces the whole process")
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # The peak would be the peak since tracing started.
+                raise ImproperlyConfigured(
+                    "tracemalloc is already tracing, so the peak memory of "
+                    "a request can only be measured on Python 3.9 or later")
+            if self.top_allocations:
+                self.snapshot = tracemalloc.take_snapshot()
+            self.start = tracemalloc.get_traced_memory()[0]
+        except BaseException:
+            self._stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        self.net = current - self.start
+        self.peak = max(peak - self.start, self.net, 0)
+        if self.snapshot is not None:
+            self.statistics = tracemalloc.take_snapshot().compare_to(
+                self.snapshot, 'lineno')[:self.top_allocations]
+        self._stop()
+
+    def _stop(self):
+        import tracemalloc
+        if self.started:
+            tracemalloc.stop()
+        _memory_lock.release()
+
+    def finish(self, response):
+        response.memory_peak = self.peak
+        response.memory_net = self.net
+
+        if self.max_memory is not None and self.peak > self.max_memory:
+            message = "{} bytes allocated at peak, at most {} expected".format(
+                self.peak, self.max_memory)
+            if self.snapshot is not None:
+                message += "\nTop allocations were:\n{}".format(
+                    '\n'.join('{}. {}'.format(i, stat) for i, stat
+                              in enumerate(self.statistics, start=1)))
+            raise AssertionError(message)
+
+
+# cProfile profiles the thread it is enabled in, where only one profiler
+# can be active.
+_profiling = threading.local()
+
+
+class ProfileProbe:
+    def __init__(self, path, threshold=None, top=20, stream=None):
+        self.path = path
+        self.threshold = threshold
+        self.top = top
+        self.stream = stream
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        if getattr(_profiling, 'active', False):
+            raise ImproperlyConfigured(
+                "Requests that run at the same time in one thread can't be "
+                "profiled")
+        _profiling.active = True
+        self.start = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        self.duration = time.perf_counter() - self.start
+        _profiling.active = False
+
+    def finish(self, response):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.profile.dump_stats(self.path)
+
+        if self.threshold is not None and self.duration > self.threshold:
+            stream = self.stream or sys.stdout
+            stream.write(
+                "Request took {:.3f}s, more than {:.3f}s. Profile written to "
+                "{}\n".format(self.duration, self.threshold, self.path))
+            pstats.Stats(self.profile, stream=stream).sort_stats(
+                'cumulative').print_stats(self.top)
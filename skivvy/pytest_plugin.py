@@ -0,0 +1,98 @@
+"""
+pytest plugin that generates a test for each combination of ``users`` and
+``methods`` declared on a ViewTestCase, checking the response status
+against ``expected_status``:
+
+    class ProjectViewTest(ViewTestCase, TestCase):
+        view_class = ProjectView
+        users = {'anonymous': None, 'owner': 'owner', 'other': 'other'}
+        methods = ('GET', 'POST')
+        expected_status = {'anonymous': 302,
+                           'owner': 200,
+                           'other': {'GET': 200, 'POST': 403}}
+
+The tests are added to the class as ordinary test methods, so they share
+the class's ``setup_class_models`` data and cached view, and are collected
+in the same order on every pytest-xdist worker.
+"""
+import inspect
+import re
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from . import ViewTestCase
+
+
+def get_users(users):
+    if isinstance(users, dict):
+        # None, the anonymous user, sorts first.
+        return sorted(users.items(),
+                      key=lambda item: (item[0] is not None, str(item[0])))
+    return [(name, name) for name in users]
+
+
+def get_expected_status(expected_status, user, method):
+    if isinstance(expected_status, int):
+        return expected_status
+    status = expected_status.get(user)
+    if isinstance(status, dict):
+        return status.get(method)
+    return status
+
+
+def resolve_user(test_case, user):
+    if user is None:
+        return None
+    elif callable(user):
+        return user(test_case)
+    return getattr(test_case, user)
+
+
+def make_request_test(user_name, user, method, status):
+    def test(self):
+        response = self.request(method=method, user=resolve_user(self, user))
+        assert response.status_code == status, (
+            "{} request by user '{}' returned status {}, expected {}".format(
+                method, user_name, response.status_code, status))
+    return test
+
+
+def generate_request_tests(cls):
+    if '_request_tests' in cls.__dict__:
+        return cls._request_tests
+
+    names = []
+    user_names = {}
+    users = get_users(getattr(cls, 'users', {None: None}))
+    for user_name, user in users:
+        for method in getattr(cls, 'methods', ('GET',)):
+            status = get_expected_status(cls.expected_status, user_name,
+                                         method)
+            if status is None:
+                continue
+            name = 'test_request'
+            if user_name is not None:
+                name += '_' + re.sub(r'\W', '_', str(user_name))
+            name += '_' + method.lower()
+            if name in user_names:
+                raise ImproperlyConfigured(
+                    "Users {!r} and {!r} of {} would both be tested by "
+                    "{}".format(user_names[name], user_name,
+                                cls.__qualname__, name))
+            user_names[name] = user_name
+            test = make_request_test(user_name, user, method, status)
+            test.__name__ = name
+            test.__qualname__ = '{}.{}'.format(cls.__qualname__, name)
+            setattr(cls, name, test)
+            names.append(name)
+
+    cls._request_tests = tuple(names)
+    return cls._request_tests
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pycollect_makeitem(collector, name, obj):
+    if (inspect.isclass(obj) and issubclass(obj, ViewTestCase) and
+            hasattr(obj, 'expected_status')):
+        generate_request_tests(obj)
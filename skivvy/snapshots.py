@@ -0,0 +1,121 @@
+import difflib
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class SnapshotStore:
+    """
+    Stores snapshot contents under their SHA-256 digest in
+    ``<directory>/objects``. ``<directory>/index.json`` maps snapshot names
+    to digests, so identical content is stored once and comparing against
+    a snapshot only needs the index.
+
+    The index is updated under a lock, re-reading it first, so processes
+    writing snapshots at the same time, such as pytest-xdist workers,
+    keep each other's entries.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.lock_path = os.path.join(directory, 'index.lock')
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def digest(content):
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, name):
+        return self.index.get(name)
+
+    def read(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    def write(self, name, content):
+        digest = self.digest(content)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+
+        if self.index.get(name) != digest:
+            with _lock(self.lock_path):
+                self._index = self._read_index()
+                self._index[name] = digest
+                _write_atomic(self.index_path, json.dumps(
+                    self._index, indent=0, sort_keys=True).encode('utf-8'))
+        return digest
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest[2:])
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+_stores = {}
+
+
+def get_store(directory):
+    directory = os.path.abspath(directory)
+    if directory not in _stores:
+        _stores[directory] = SnapshotStore(directory)
+    return _stores[directory]
+
+
+def diff_snapshot(expected, actual, name):
+    return ''.join(difflib.unified_diff(
+        expected.decode('utf-8', 'replace').splitlines(keepends=True),
+        actual.decode('utf-8', 'replace').splitlines(keepends=True),
+        fromfile='snapshot {}'.format(name), tofile='response'))
@@ -1,7 +1,7 @@
 from django.conf import settings
 
 
-def pytest_configure():
+def pytest_configure(config):
     settings.configure(
         DEBUG_PROPAGATE_EXCEPTIONS=True,
         DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
@@ -42,3 +42,8 @@ def pytest_configure():
             },
         ]
     )
+
+    # Registered here unless the package is installed, in which case its
+    # entry point has already registered the plugin as 'skivvy'.
+    if not config.pluginmanager.has_plugin('skivvy'):
+        config.pluginmanager.import_plugin('skivvy.pytest_plugin')
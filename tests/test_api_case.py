@@ -1,4 +1,6 @@
+import asyncio
 from unittest.mock import MagicMock
+import pytest
 from django.test import TestCase
 from django.contrib.auth.models import User
 from skivvy import APITestCase
@@ -12,9 +14,12 @@ def test_get_post_data_multipart():
 
     case = TheCase()
     post_data = case._get_post_data(content_type='multipart/form-data')
-    assert (post_data.decode() == '--BoUnDaRyStRiNg\r\nContent-Disposition: '
-                                  'form-data; name="some"\r\n\r\ndata\r\n--'
-                                  'BoUnDaRyStRiNg--\r\n')
+    boundary = post_data.boundary
+    assert case.content_type == ('multipart/form-data; boundary=' +
+                                 boundary)
+    assert (post_data.read().decode() == (
+        '--{0}\r\nContent-Disposition: form-data; name="some"\r\n\r\n'
+        'data\r\n--{0}--\r\n'.format(boundary)))
 
 
 def test_request_get():
@@ -151,3 +156,121 @@ def test_request_overwrite_view_kwargs():
     case.request(view_kwargs={'test_arg': True})
 
     case.setup_view.assert_called_with(view_kwargs={'test_arg': True})
+
+
+def test_setup_view_viewset_actions_cached():
+    class TheCase(APITestCase, TestCase):
+        view_class = APIViewSetTestView
+        viewset_actions = {'get': 'list'}
+
+    case = TheCase()
+    view = case.setup_view()
+    assert case.setup_view() is view
+
+    case.viewset_actions = {'post': 'list'}
+    assert case.setup_view() is not view
+
+
+def test_request_many():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        post_data = {'some': 'json'}
+
+    user = User(username='user')
+    case = TheCase()
+    responses = case.request_many(matrix={'method': ['GET', 'POST'],
+                                          'user': [user, user]})
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert all(r.content == {'some': 'json'} for r in responses)
+    assert case._request.user == user
+
+
+def test_request_many_thread_pool():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+
+    case = TheCase()
+    responses = case.request_many(
+        [{'method': 'POST', 'post_data': {'key': i}} for i in range(10)],
+        workers=3)
+
+    assert [r.content for r in responses] == [{'key': i} for i in range(10)]
+
+
+def test_async_request():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+
+    user = User(username='user')
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        response = loop.run_until_complete(case.async_request(user=user))
+    finally:
+        loop.close()
+
+    assert case._request.user == user
+    assert response.status_code == 200
+    assert response.content == {'some': 'json'}
+
+
+@pytest.mark.django_db
+def test_request_capture_queries():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        max_queries = 0
+
+    case = TheCase()
+    response = case.request()
+    assert response.query_count == 0
+    assert response.content == {'some': 'json'}
+
+
+def test_request_timings():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        post_data = {'some': 'json'}
+
+    case = TheCase()
+    response = case.request(method='POST')
+    assert response.content == {'some': 'json'}
+    assert list(response.timings) == ['defaults', 'encode', 'request',
+                                      'session', 'dispatch', 'render',
+                                      'decode']
+
+
+def test_request_use_response_data():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        use_response_data = True
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.content == {'some': 'json'}
+    assert 'render' not in response.timings
+
+    assert response.raw_content == b'{"some":"json"}'
+    assert 'render' in response.timings
+    assert response.headers['content-type'][1] == 'application/json'
+
+
+def test_request_raw_content():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+
+    case = TheCase()
+    response = case.request()
+    assert response.content == {'some': 'json'}
+    assert response.raw_content == b'{"some":"json"}'
+
+
+def test_request_template_keeps_factory_attributes():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+
+    case = TheCase()
+    case.request(method='POST', post_data={'some': 'json'})
+    assert case._request._dont_enforce_csrf_checks is True
+    assert case._request.META['CONTENT_TYPE'] == 'application/json'
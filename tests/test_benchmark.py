@@ -0,0 +1,82 @@
+import gc
+import pytest
+from django.test import TestCase
+from skivvy import ViewTestCase, APITestCase
+from skivvy.benchmark import BenchmarkResult, percentile, run_benchmark
+
+from . import views
+
+
+def test_percentile():
+    timings = [i / 100 for i in range(1, 101)]
+    assert percentile(timings, 50) == 0.5
+    assert percentile(timings, 95) == 0.95
+    assert percentile(timings, 99) == 0.99
+    assert percentile([0.1], 99) == 0.1
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile(list(range(1, 31)), 95) == 29
+    assert percentile(list(range(1, 8)), 99) == 7
+
+
+def test_benchmark_result():
+    result = BenchmarkResult([0.3, 0.1, 0.2, 0.4], duration=2.0)
+    assert result.iterations == 4
+    assert result.timings == [0.1, 0.2, 0.3, 0.4]
+    assert result.requests_per_second == 2.0
+    assert result.mean == pytest.approx(0.25)
+    assert result.p50 == 0.2
+    assert result.p99 == 0.4
+    assert repr(result) == ('<BenchmarkResult 4 requests, 2.0 req/s, '
+                            'p50 200.000ms, p95 400.000ms, p99 400.000ms>')
+
+
+def test_run_benchmark_calls():
+    calls = []
+    result = run_benchmark(lambda: calls.append(1), 5, warmup=3)
+    assert len(calls) == 8
+    assert result.iterations == 5
+    assert len(result.timings) == 5
+
+
+def test_run_benchmark_disable_gc():
+    states = []
+    run_benchmark(lambda: states.append(gc.isenabled()), 3, disable_gc=True)
+    assert states == [False, False, False]
+    assert gc.isenabled()
+
+
+def test_run_benchmark_invalid_iterations():
+    with pytest.raises(ValueError):
+        run_benchmark(lambda: None, 0)
+
+
+def test_benchmark_view():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        post_data = {'key': 'value'}
+
+    case = TheCase()
+    result = case.benchmark_view(iterations=5, warmup=1, method='POST')
+
+    assert result.iterations == 5
+    assert result.requests_per_second > 0
+    assert result.p50 <= result.p95 <= result.p99
+    assert case._request.method == 'POST'
+    assert not hasattr(case, '_request_defaults')
+
+
+def test_benchmark_view_streaming():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+
+    result = TheCase().benchmark_view(iterations=2, warmup=0)
+    assert result.iterations == 2
+
+
+def test_benchmark_api_view():
+    class TheCase(APITestCase, TestCase):
+        view_class = views.APITestView
+
+    result = TheCase().benchmark_view(iterations=3, warmup=0,
+                                      disable_gc=True)
+    assert result.iterations == 3
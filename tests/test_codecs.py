@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import MagicMock
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from skivvy import APITestCase
+from skivvy.codecs import JSONCodec, OrjsonCodec, get_json_codec
+
+from .views import APITestView
+
+
+def test_json_codec():
+    codec = JSONCodec()
+    assert codec.dumps({'some': ['json', 1]}) == b'{"some": ["json", 1]}'
+    assert codec.loads(b'{"some": ["json", 1]}') == {'some': ['json', 1]}
+    assert codec.loads('{"some": "json"}') == {'some': 'json'}
+
+
+def test_orjson_codec():
+    pytest.importorskip('orjson')
+    codec = OrjsonCodec()
+    assert codec.dumps({'some': ['json', 1]}) == b'{"some":["json",1]}'
+    assert codec.dumps({1: 'json'}) == b'{"1":"json"}'
+    assert codec.loads(b'{"some": ["json", 1]}') == {'some': ['json', 1]}
+
+
+def test_orjson_codec_fallback():
+    pytest.importorskip('orjson')
+    codec = OrjsonCodec()
+    assert codec.dumps({'n': 2 ** 64}) == b'{"n": 18446744073709551616}'
+    assert codec.loads(b'{"n": NaN}')['n'] != codec.loads(b'{"n": NaN}')['n']
+    with pytest.raises(TypeError):
+        codec.dumps({'some': object()})
+
+
+def test_get_json_codec():
+    assert isinstance(get_json_codec('json'), JSONCodec)
+    assert get_json_codec('json') is get_json_codec('json')
+
+    try:
+        import orjson  # noqa
+        assert isinstance(get_json_codec(), OrjsonCodec)
+    except ImportError:
+        assert isinstance(get_json_codec(), JSONCodec)
+
+
+def test_get_json_codec_unknown():
+    with pytest.raises(ImproperlyConfigured):
+        get_json_codec('yaml')
+
+
+def test_request_with_json_codec():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        post_data = {'some': 'json'}
+        json_codec = 'json'
+
+    case = TheCase()
+    assert case._get_post_data() == b'{"some": "json"}'
+    response = case.request(method='POST')
+    assert response.content == {'some': 'json'}
+
+
+def test_request_with_custom_json_codec():
+    class TheCase(APITestCase, TestCase):
+        view_class = APITestView
+        json_codec = MagicMock(wraps=JSONCodec())
+
+    case = TheCase()
+    response = case.request(method='POST', post_data={'some': 'json'})
+    assert response.content == {'some': 'json'}
+    case.json_codec.dumps.assert_called_once_with({'some': 'json'})
+    case.json_codec.loads.assert_called_once_with(b'{"some":"json"}')
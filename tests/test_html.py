@@ -0,0 +1,99 @@
+import pytest
+from django.test import TestCase
+from skivvy import ViewTestCase
+from skivvy.html import compare_html, parse_expected_html, parse_html
+
+from . import views
+
+
+def test_parse_html_normalizes_formatting():
+    html = '<div  id="a"   class="y x">\n  Some   text\n</div>'
+    assert parse_html(html) == (
+        ('start', 'div', (('class', 'x y'), ('id', 'a'))),
+        ('text', 'Some text'),
+        ('end', 'div'))
+
+
+def test_parse_html_void_and_boolean_attributes():
+    assert (parse_html('<input checked><br/>') ==
+            parse_html('<input checked="checked" /><br></br>'))
+
+
+def test_parse_html_entities_and_comments():
+    assert parse_html('<p>a &amp; b<!-- note --></p>') == (
+        ('start', 'p', ()), ('text', 'a & b'), ('end', 'p'))
+
+
+def test_parse_expected_html_is_cached():
+    html = '<p>Cached</p>'
+    assert parse_expected_html(html) is parse_expected_html(html)
+
+
+def test_compare_html_equal():
+    expected = parse_html('<ul><li b="2" a="1">One</li></ul>')
+    actual = '<ul>\n  <li a="1" b="2">One</li>\n</ul>'
+    assert compare_html(expected, [actual]) is None
+
+
+def test_compare_html_reports_path():
+    expected = parse_html('<div><p>One</p><p>Two</p></div>')
+    difference = compare_html(expected, ['<div><p>One</p><p>Three</p></div>'])
+
+    assert difference.path == '/div[1]/p[2]'
+    assert str(difference) == ("HTML differs at /div[1]/p[2]:\n"
+                               "  expected: 'Two'\n"
+                               "  actual:   'Three'")
+
+
+def test_compare_html_stops_at_first_difference():
+    expected = parse_html('<p>One</p><p>Two</p>')
+    consumed = []
+
+    def chunks():
+        for chunk in ['<p>Other</p>', '<p>Two</p>', '<p>Never</p>']:
+            consumed.append(chunk)
+            yield chunk
+
+    assert compare_html(expected, chunks()) is not None
+    assert consumed == ['<p>Other</p>']
+
+
+def test_compare_html_chunk_boundaries():
+    html = '<div class="a"><p>Some long text</p></div>'
+    chunks = [html[i:i + 3] for i in range(0, len(html), 3)]
+    assert compare_html(parse_html(html), chunks) is None
+
+
+def test_compare_html_missing_and_extra_content():
+    expected = parse_html('<p>One</p>')
+    assert str(compare_html(expected, ['<p>One'])) == (
+        'HTML differs at /p[1]:\n'
+        '  expected: </p>\n'
+        '  actual:   end of document')
+    assert compare_html(expected, ['<p>One</p><br>']).actual == \
+        ('start', 'br', ())
+
+
+def test_assert_html_equal():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+        template = 'test.html'
+        template_context = {'id': 'test-id'}
+
+    case = TheCase()
+    response = case.request()
+    case.assert_html_equal(response)
+    case.assert_html_equal(response, expected='<h1>\n  test-id\n</h1>')
+
+    with pytest.raises(AssertionError) as e:
+        case.assert_html_equal(response, expected='<h1>other-id</h1>')
+    assert 'HTML differs at /h1[1]' in str(e.value)
+
+
+def test_assert_html_equal_streaming():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+
+    case = TheCase()
+    expected = ''.join('row {}\n'.format(i) for i in range(100))
+    case.assert_html_equal(case.request(), expected=expected)
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import skivvy
+
+
+def test_import_without_settings():
+    code = (
+        'import sys\n'
+        'import skivvy\n'
+        'from django.conf import settings\n'
+        'assert not settings.configured\n'
+        'assert "rest_framework" not in sys.modules\n'
+        'assert "django.contrib.messages" not in sys.modules\n'
+        'assert "django.template" not in sys.modules\n'
+        'assert "asyncio" not in sys.modules\n'
+    )
+    env = os.environ.copy()
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(skivvy.__file__))
+    subprocess.check_call([sys.executable, '-c', code], env=env)
+
+
+def test_request_factory_lazy_import():
+    from django.test import RequestFactory
+    from rest_framework.test import APIRequestFactory
+
+    assert skivvy.ViewTestCase.request_factory is RequestFactory
+    assert skivvy.APITestCase.request_factory is APIRequestFactory
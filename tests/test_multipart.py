@@ -0,0 +1,158 @@
+import io
+import mmap
+import pathlib
+import tempfile
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.test.client import encode_multipart
+from skivvy import ViewTestCase, APITestCase
+from skivvy.multipart import MultipartEncoder
+
+from .views import APIUploadView, UploadView
+
+
+def test_encoder_matches_django_encoding():
+    data = {'some': 'data', 'many': ['a', 'b'], 'number': 1}
+    encoder = MultipartEncoder(data, boundary='BoUnDaRyStRiNg')
+    expected = encode_multipart('BoUnDaRyStRiNg', data)
+    assert encoder.length == len(expected)
+    assert encoder.read() == expected
+
+
+def test_encoder_encodes_files_like_django():
+    def data():
+        upload = io.BytesIO(b'a,b\n1,2\n')
+        upload.name = '/tmp/data.csv'
+        return {'upload': upload}
+
+    encoder = MultipartEncoder(data(), boundary='BoUnDaRyStRiNg')
+    expected = encode_multipart('BoUnDaRyStRiNg', data())
+    assert encoder.length == len(expected)
+    assert encoder.read() == expected
+
+
+def test_encoder_uses_uploaded_file_content_type():
+    def data():
+        return {'image': SimpleUploadedFile('a.txt', b'not really a png',
+                                            content_type='image/png')}
+
+    encoder = MultipartEncoder(data(), boundary='BoUnDaRyStRiNg')
+    expected = encode_multipart('BoUnDaRyStRiNg', data())
+    assert b'Content-Type: image/png' in expected
+    assert encoder.read() == expected
+
+
+def test_encoder_file_without_string_name():
+    with tempfile.TemporaryFile() as upload:
+        upload.write(b'data')
+        upload.seek(0)
+        encoder = MultipartEncoder({'upload': upload},
+                                   boundary='BoUnDaRyStRiNg')
+        content = encoder.read()
+        upload.seek(0)
+        assert content == encode_multipart('BoUnDaRyStRiNg',
+                                           {'upload': upload})
+    assert b'filename="upload"' in content
+
+
+def test_encoder_rejects_none():
+    with pytest.raises(TypeError):
+        MultipartEncoder({'some': None})
+
+
+def test_encoder_random_boundary():
+    first = MultipartEncoder({})
+    second = MultipartEncoder({})
+    assert first.boundary != second.boundary
+    assert first.content_type == ('multipart/form-data; boundary=' +
+                                  first.boundary)
+
+
+def test_encoder_read_in_chunks():
+    encoder = MultipartEncoder({'upload': memoryview(b'x' * 1000)})
+    expected = MultipartEncoder({'upload': memoryview(b'x' * 1000)},
+                                boundary=encoder.boundary).read()
+    chunks = []
+    chunk = encoder.read(7)
+    while chunk:
+        assert len(chunk) <= 7
+        chunks.append(chunk)
+        chunk = encoder.read(7)
+    assert b''.join(chunks) == expected
+    assert len(expected) == encoder.length
+
+
+def test_encoder_maps_files_from_disk(tmpdir):
+    path = pathlib.Path(str(tmpdir.join('image.png')))
+    path.write_bytes(b'\x89PNG' * 50000)
+    encoder = MultipartEncoder({'image': path}, boundary='b')
+    encoder.chunk_size = 1024
+
+    body = encoder.read()
+    assert b'filename="image.png"\r\nContent-Type: image/png' in body
+    assert b'\x89PNG' * 50000 in body
+    assert len(body) == encoder.length
+
+
+def test_encoder_open_file_from_current_position(tmpdir):
+    path = tmpdir.join('data.txt')
+    path.write_binary(b'headerbody')
+    with open(str(path), 'rb') as upload:
+        upload.read(6)
+        body = MultipartEncoder({'upload': upload}, boundary='b').read()
+    assert b'\r\n\r\nbody\r\n' in body
+
+
+def test_encoder_empty_file(tmpdir):
+    path = pathlib.Path(str(tmpdir.join('empty.txt')))
+    path.write_bytes(b'')
+    encoder = MultipartEncoder({'upload': path}, boundary='b')
+    assert encoder.read() == (
+        b'--b\r\nContent-Disposition: form-data; name="upload"; '
+        b'filename="empty.txt"\r\nContent-Type: text/plain\r\n\r\n\r\n'
+        b'--b--\r\n')
+
+
+def test_encoder_mmap():
+    buffer = mmap.mmap(-1, 4096)
+    buffer.write(b'y' * 4096)
+    body = MultipartEncoder({'upload': buffer}, boundary='b').read()
+    assert b'filename="upload"' in body
+    assert b'y' * 4096 in body
+    buffer.close()
+
+
+def test_view_request_multipart_upload(tmpdir):
+    path = pathlib.Path(str(tmpdir.join('large.bin')))
+    path.write_bytes(b'z' * (3 * 1024 * 1024))
+
+    class TheCase(ViewTestCase, TestCase):
+        view_class = UploadView
+        post_data = {'title': 'Large', 'tags': ['a', 'b']}
+
+    case = TheCase()
+    response = case.request(method='POST',
+                            post_data={'upload': path},
+                            content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.content == ('tags=a,b\ntitle=Large\n'
+                                'upload:large.bin:3145728')
+    assert case.content_type.startswith('multipart/form-data; boundary=')
+
+
+def test_api_request_multipart_upload():
+    upload = io.BytesIO(b'content')
+    upload.name = 'file.txt'
+
+    class TheCase(APITestCase, TestCase):
+        view_class = APIUploadView
+
+    case = TheCase()
+    response = case.request(method='POST',
+                            post_data={'some': 'json', 'upload': upload},
+                            content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.content == {'upload': ['file.txt', 7]}
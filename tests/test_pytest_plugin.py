@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+import pytest
+from skivvy import ViewTestCase
+from skivvy.pytest_plugin import (generate_request_tests,
+                                  get_expected_status, get_users)
+
+from . import views
+
+
+def test_get_users():
+    users = get_users({'b': 'user_b', 'a': None})
+    assert users == [('a', None), ('b', 'user_b')]
+    assert get_users(['owner', 'staff']) == [('owner', 'owner'),
+                                             ('staff', 'staff')]
+    assert get_users({'owner': 'owner', None: None}) == [
+        (None, None), ('owner', 'owner')]
+
+
+def test_get_expected_status():
+    assert get_expected_status(200, 'owner', 'GET') == 200
+    spec = {'owner': 200, 'other': {'GET': 200, 'POST': 403}}
+    assert get_expected_status(spec, 'owner', 'POST') == 200
+    assert get_expected_status(spec, 'other', 'POST') == 403
+    assert get_expected_status(spec, 'other', 'PUT') is None
+    assert get_expected_status(spec, 'missing', 'GET') is None
+
+
+def test_generate_request_tests():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        users = {'anonymous': None, 'some user': lambda case: User()}
+        methods = ('GET', 'POST', 'PUT')
+        expected_status = {'anonymous': {'GET': 200, 'PUT': 405},
+                           'some user': 200}
+
+    names = generate_request_tests(TheCase)
+    assert names == ('test_request_anonymous_get',
+                     'test_request_anonymous_put',
+                     'test_request_some_user_get',
+                     'test_request_some_user_post',
+                     'test_request_some_user_put')
+    assert generate_request_tests(TheCase) is names
+
+    TheCase('test_request_anonymous_get').test_request_anonymous_get()
+    TheCase().test_request_anonymous_put()
+
+
+def test_generate_request_tests_duplicate_names():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        users = {'some user': 'user', 'some-user': 'other_user'}
+        expected_status = 200
+
+    with pytest.raises(ImproperlyConfigured) as e:
+        generate_request_tests(TheCase)
+    assert 'test_request_some_user_get' in str(e.value)
+
+
+def test_generate_request_tests_failure():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        expected_status = 404
+
+    assert generate_request_tests(TheCase) == ('test_request_get',)
+    with pytest.raises(AssertionError) as e:
+        TheCase().test_request_get()
+    assert str(e.value).startswith(
+        "GET request by user 'None' returned status 200, expected 404")
+
+
+def test_generate_request_tests_subclass():
+    class BaseCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        expected_status = 200
+
+    class TheCase(BaseCase):
+        methods = ('GET', 'HEAD')
+
+    assert generate_request_tests(BaseCase) == ('test_request_get',)
+    assert generate_request_tests(TheCase) == ('test_request_get',
+                                               'test_request_head')
+    assert not hasattr(BaseCase, 'test_request_head')
+
+
+class TestRequestMatrix(ViewTestCase, TestCase):
+    view_class = views.GenericView
+    users = {'anonymous': None, 'owner': 'owner'}
+    methods = ('GET', 'DELETE')
+    expected_status = {'anonymous': {'GET': 200},
+                       'owner': {'GET': 200, 'DELETE': 405}}
+
+    @classmethod
+    def setup_class_models(cls):
+        cls.owner = User.objects.create(username='owner')
+
+
+def test_request_matrix_collected(request):
+    names = {item.name for item in request.session.items
+             if getattr(item, 'cls', None) is TestRequestMatrix}
+    assert names == {'test_request_anonymous_get', 'test_request_owner_get',
+                     'test_request_owner_delete'}
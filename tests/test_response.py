@@ -0,0 +1,121 @@
+import hashlib
+import pickle
+import pytest
+from unittest.mock import MagicMock
+from django.test import TestCase
+from skivvy import Response, ViewTestCase
+
+from . import views
+
+
+def test_response_fields():
+    response = Response(200, 'content', '/location/', ['message'], {})
+    assert response.status_code == 200
+    assert response.content == 'content'
+    assert response.location == '/location/'
+    assert response.messages == ['message']
+    assert response.headers == {}
+    assert response._asdict() == {'status_code': 200,
+                                  'content': 'content',
+                                  'location': '/location/',
+                                  'messages': ['message'],
+                                  'headers': {}}
+
+
+def test_response_tuple_compatibility():
+    response = Response(200, 'content', None, [], {})
+    status_code, content, location, messages, headers = response
+    assert status_code == 200
+    assert content == 'content'
+    assert len(response) == 5
+    assert response[0] == 200
+    assert response[-1] == {}
+    assert response == (200, 'content', None, [], {})
+    assert response != (404, 'content', None, [], {})
+    assert response == Response(200, 'content', None, [], {})
+
+
+def test_response_is_slotted():
+    response = Response(200)
+    assert not hasattr(response, '__dict__')
+
+
+def test_response_getitem_is_lazy():
+    content = MagicMock(return_value='content')
+    response = Response(200, location='/', loaders={'content': content})
+    assert response[0] == 200
+    assert response[-3] == '/'
+    assert response[::2] == (200, '/', None)
+    assert content.call_count == 0
+    assert response[:2] == (200, 'content')
+    assert content.call_count == 1
+    with pytest.raises(IndexError):
+        response[5]
+
+
+def test_response_lazy_fields():
+    loader = MagicMock(return_value='content')
+    response = Response(200, loaders={'content': loader})
+    assert loader.call_count == 0
+    assert response.content == 'content'
+    assert response.content == 'content'
+    assert loader.call_count == 1
+
+
+def test_response_pickle():
+    response = Response(200, location='/', loaders={'content': lambda: 'a'})
+    loaded = pickle.loads(pickle.dumps(response))
+    assert loaded == (200, 'a', '/', None, None)
+
+
+def test_response_pickle_content():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    response = TheCase().request()
+    loaded = pickle.loads(pickle.dumps(response))
+    assert loaded == response
+    assert loaded.raw_content == b'<h1>Test content<h1>'
+    assert loaded.content_length == len(loaded.raw_content)
+    assert loaded.content_digest == hashlib.sha256(
+        loaded.raw_content).hexdigest()
+    assert list(loaded.chunks) == [loaded.raw_content]
+
+
+def test_response_pickle_streaming():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+
+    response = TheCase().request()
+    loaded = pickle.loads(pickle.dumps(response))
+    assert loaded.raw_content is None
+    assert loaded.content_length == response.content_length
+    assert loaded.content_digest == response.content_digest
+    with pytest.raises(ValueError):
+        list(loaded.chunks)
+
+
+def test_response_pickle_memory():
+    response = Response(200, memory_peak=2048, memory_net=1024)
+    loaded = pickle.loads(pickle.dumps(response))
+    assert loaded.memory_peak == 2048
+    assert loaded.memory_net == 1024
+
+
+def test_response_repr():
+    response = Response(200, 'content')
+    assert repr(response) == ("Response(status_code=200, content='content', "
+                              "location=None, messages=None, headers=None)")
+
+
+def test_request_renders_on_content_access():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+
+    case = TheCase()
+    response = case.request()
+    assert response.status_code == 200
+    assert 'content' in response._loaders
+
+    assert response.content == '<h1>test-id</h1>\n'
+    assert 'content' not in response._loaders
@@ -0,0 +1,106 @@
+import copy
+from django.contrib.sessions.backends.base import CreateError
+from django.test import TestCase
+import pytest
+from skivvy import ViewTestCase
+from skivvy.sessions import SessionStore
+
+from . import views
+
+
+def test_session_store_data():
+    session = SessionStore()
+    session['key'] = 'value'
+    assert session['key'] == 'value'
+    assert session.get('other') is None
+    assert session.modified
+
+
+def test_session_store_save_and_load():
+    session = SessionStore()
+    session['key'] = 'value'
+    session.save()
+    assert session.session_key is not None
+    assert session.exists(session.session_key)
+    assert session.load() == {'key': 'value'}
+
+
+def test_session_store_create_existing():
+    session = SessionStore()
+    session.create()
+    with pytest.raises(CreateError):
+        session.save(must_create=True)
+
+
+def test_session_store_cycle_key():
+    session = SessionStore()
+    session['key'] = 'value'
+    session.save()
+    old_key = session.session_key
+
+    session.cycle_key()
+    assert session.session_key != old_key
+    assert not session.exists(old_key)
+    assert session['key'] == 'value'
+
+
+def test_session_store_flush():
+    session = SessionStore()
+    session['key'] = 'value'
+    session.save()
+    session.flush()
+    assert session.session_key is None
+    assert session.get('key') is None
+
+
+def test_session_store_copy():
+    session = SessionStore()
+    session['key'] = 'value'
+    session.save()
+
+    clone = copy.copy(session)
+    clone['key'] = 'other'
+    clone.save()
+    assert session['key'] == 'value'
+    assert session.load() == {'key': 'value'}
+
+
+def test_session_store_no_queries():
+    # Database access is blocked in tests that don't request it.
+    session = SessionStore()
+    session['key'] = 'value'
+    session.save()
+    session.cycle_key()
+    session.delete()
+    assert not session.exists(session.session_key)
+
+
+def test_request_uses_in_memory_session():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    case.request(session_data={'s_data': 'Session Data'})
+    assert isinstance(case._request.session, SessionStore)
+
+
+def test_request_uses_session_engine():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        session_engine = None
+
+    case = TheCase()
+    response = case.request(session_data={'s_data': 'Session Data'})
+    assert not isinstance(case._request.session, SessionStore)
+    assert response.content == '<h1>Test content<h1><p>Session Data</p>'
+
+
+def test_request_uses_custom_session_engine():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        session_engine = 'django.contrib.sessions.backends.signed_cookies'
+
+    case = TheCase()
+    case.request()
+    assert (type(case._request.session).__module__ ==
+            'django.contrib.sessions.backends.signed_cookies')
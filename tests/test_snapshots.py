@@ -0,0 +1,133 @@
+import json
+import os
+import pytest
+from django.test import TestCase
+from skivvy import ViewTestCase, APITestCase
+from skivvy.snapshots import SnapshotStore, get_store
+
+from . import views
+
+
+def test_store_write_and_read(tmpdir):
+    store = SnapshotStore(str(tmpdir))
+    digest = store.write('page', b'<h1>Page</h1>')
+
+    assert store.get('page') == digest
+    assert store.read(digest) == b'<h1>Page</h1>'
+    with open(os.path.join(str(tmpdir), 'index.json')) as f:
+        assert json.load(f) == {'page': digest}
+
+
+def test_store_deduplicates_content(tmpdir):
+    store = SnapshotStore(str(tmpdir))
+    first = store.write('first', b'same')
+    second = store.write('second', b'same')
+
+    assert first == second
+    objects = [name for _, _, files in os.walk(str(tmpdir.join('objects')))
+               for name in files]
+    assert len(objects) == 1
+
+
+def test_store_keeps_entries_of_other_processes(tmpdir):
+    first = SnapshotStore(str(tmpdir))
+    second = SnapshotStore(str(tmpdir))
+    first.index
+    second.index
+
+    one = first.write('one', b'1')
+    two = second.write('two', b'2')
+
+    with open(os.path.join(str(tmpdir), 'index.json')) as f:
+        assert json.load(f) == {'one': one, 'two': two}
+    assert second.get('one') == one
+
+
+def test_store_loads_index(tmpdir):
+    SnapshotStore(str(tmpdir)).write('page', b'content')
+    store = SnapshotStore(str(tmpdir))
+    assert store.read(store.get('page')) == b'content'
+
+
+def test_get_store_is_cached(tmpdir):
+    assert get_store(str(tmpdir)) is get_store(str(tmpdir))
+
+
+def make_case(tmpdir, view_class=views.GenericTemplateView, base=ViewTestCase,
+              **attrs):
+    attrs.update(view_class=view_class, snapshot_dir=str(tmpdir))
+    return type('TheCase', (base, TestCase), attrs)()
+
+
+def test_assert_matches_snapshot_missing(tmpdir, monkeypatch):
+    monkeypatch.delenv('SKIVVY_UPDATE_SNAPSHOTS', raising=False)
+    case = make_case(tmpdir)
+    with pytest.raises(AssertionError) as e:
+        case.assert_matches_snapshot(case.request())
+    assert 'SKIVVY_UPDATE_SNAPSHOTS' in str(e.value)
+
+
+def test_assert_matches_snapshot_update_and_match(tmpdir):
+    case = make_case(tmpdir, update_snapshots=True)
+    response = case.request()
+    case.assert_matches_snapshot(response, name='page')
+
+    case = make_case(tmpdir)
+    case.assert_matches_snapshot(case.request(), name='page')
+    assert (get_store(str(tmpdir)).read(get_store(str(tmpdir)).get('page'))
+            == response.content.encode())
+
+
+def test_assert_matches_snapshot_env_update(tmpdir, monkeypatch):
+    monkeypatch.setenv('SKIVVY_UPDATE_SNAPSHOTS', '1')
+    case = make_case(tmpdir)
+    case.assert_matches_snapshot(case.request(), name='page')
+    assert get_store(str(tmpdir)).get('page') is not None
+
+
+def test_assert_matches_snapshot_mismatch_diff(tmpdir):
+    case = make_case(tmpdir, update_snapshots=True)
+    case.assert_matches_snapshot('<h1>Old</h1>\n<p>Same</p>\n', name='page')
+
+    case = make_case(tmpdir)
+    with pytest.raises(AssertionError) as e:
+        case.assert_matches_snapshot('<h1>New</h1>\n<p>Same</p>\n',
+                                     name='page')
+    assert '-<h1>Old</h1>' in str(e.value)
+    assert '+<h1>New</h1>' in str(e.value)
+
+
+def test_assert_matches_snapshot_default_names(tmpdir):
+    case = make_case(tmpdir, update_snapshots=True)
+    case.assert_matches_snapshot('first')
+    case.assert_matches_snapshot('second')
+
+    names = sorted(get_store(str(tmpdir)).index)
+    assert names == [case.id() + ':1', case.id() + ':2']
+
+
+def test_assert_matches_snapshot_removes_csrf(tmpdir):
+    case = make_case(tmpdir, update_snapshots=True)
+    case.assert_matches_snapshot(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="abc">',
+        name='form')
+    store = get_store(str(tmpdir))
+    assert store.read(store.get('form')) == b''
+
+
+def test_assert_matches_snapshot_api_content(tmpdir):
+    case = make_case(tmpdir, view_class=views.APITestView, base=APITestCase,
+                     update_snapshots=True)
+    case.assert_matches_snapshot(case.request(), name='api')
+
+    store = get_store(str(tmpdir))
+    assert store.read(store.get('api')) == b'{\n  "some": "json"\n}'
+
+
+def test_assert_matches_snapshot_streaming(tmpdir):
+    case = make_case(tmpdir, view_class=views.StreamingView,
+                     update_snapshots=True)
+    case.assert_matches_snapshot(case.request(), name='stream')
+
+    store = get_store(str(tmpdir))
+    assert store.read(store.get('stream')).startswith(b'row 0\nrow 1\n')
@@ -1,9 +1,21 @@
+import asyncio
+import gc
+from concurrent import futures
+import hashlib
+import pstats
+import re
+import tracemalloc
+import weakref
+from unittest.mock import MagicMock, patch
 import pytest
 from django.test import TestCase
 from django.core.exceptions import ImproperlyConfigured
-from django.http import HttpRequest
+from django.http import HttpRequest, QueryDict
+from django.utils.http import urlencode
 from django.contrib.auth.models import User
+import skivvy
 from skivvy import ViewTestCase
+from skivvy.signals import request_dispatched
 
 from . import views
 
@@ -22,6 +34,48 @@ def test_get_url_params():
     assert 'key=value' in url_params
 
 
+def test_url_encode_data_matches_urlencode():
+    data = {'key with space': 'a&b=c', 'plus': '1+1', 'number': 1,
+            'list': ['x', 'y z'], 'unicode': 'sk\xedvy'}
+    assert ViewTestCase._url_encode_data(data) == urlencode(data, doseq=True)
+
+
+def test_url_encode_data_multi_value_dict():
+    data = QueryDict('a=1&a=2&b=x+y')
+    assert ViewTestCase._url_encode_data(data) == 'a=1&a=2&b=x+y'
+
+
+def test_url_encode_data_bytes():
+    data = {b'raw': b'\xff bytes', 'buffer': bytearray(b'a&b')}
+    assert (ViewTestCase._url_encode_data(data) ==
+            'raw=%FF+bytes&buffer=a%26b')
+
+
+def test_url_encode_data_empty():
+    assert ViewTestCase._url_encode_data({}) == ''
+    assert ViewTestCase._url_encode_data({'empty': []}) == ''
+
+
+def test_merge_data_multi_value_dict():
+    defaults = QueryDict('a=1&a=2&b=3')
+    merged = ViewTestCase._merge_data(defaults, {'b': '4'})
+    assert merged == {'a': ['1', '2'], 'b': '4'}
+
+    merged = ViewTestCase._merge_data({'a': '0', 'c': '5'}, defaults)
+    assert merged == {'a': ['1', '2'], 'b': ['3'], 'c': '5'}
+
+
+def test_request_multi_value_get_data():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        get_data = {'page': 1}
+
+    case = TheCase()
+    case.request(get_data=QueryDict('tag=a&tag=b'))
+    assert case._request.GET.getlist('tag') == ['a', 'b']
+    assert case._request.GET['page'] == '1'
+
+
 def test_setup_models():
     class TheCase(ViewTestCase, TestCase):
         id = 0
@@ -35,6 +89,18 @@ def test_setup_models():
     assert case.id == 1
 
 
+def test_setup_class_models_without_class_setup():
+    class TheCase(ViewTestCase, TestCase):
+        @classmethod
+        def setup_class_models(cls):
+            cls.setups = getattr(cls, 'setups', 0) + 1
+
+    case = TheCase()
+    case.setUp()
+    case.setUp()
+    assert TheCase.setups == 2
+
+
 def test_setup_models_not_present():
     class TheCase(ViewTestCase, TestCase):
         id = 0
@@ -530,6 +596,56 @@ def test_render_csrf_token():
     assert response.content == case.expected_content
 
 
+def test_render_fixed_csrf_token():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.CsrfTemplateView
+        template = 'csrf.html'
+        fixed_csrf_token = 'test-token'
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.content == case.expected_content
+    assert 'value="test-token"' in response.content
+    assert b'value="test-token"' in response.raw_content
+    assert 'csrf' not in response.timings
+
+
+def test_fixed_csrf_token_rendered_response():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+        fixed_csrf_token = 'test-token'
+
+    response = MagicMock(is_rendered=True, context_data={'id': 1})
+    TheCase()._fix_csrf_token(response)
+    assert response.context_data == {'id': 1}
+
+
+def test_fixed_csrf_token_response_rendered_in_view():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.RenderedCsrfTemplateView
+        template = 'csrf.html'
+        fixed_csrf_token = 'test-token'
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.content == case.expected_content
+    assert 'value="test-token"' in response.content
+    assert b'value="test-token"' not in response.raw_content
+
+
+def test_remove_csrf():
+    html = ('<form><input type="hidden" name="csrfmiddlewaretoken" '
+            'value="abc"><input name="x"></form>')
+    assert skivvy.remove_csrf(html) == '<form><input name="x"></form>'
+    assert (skivvy.remove_csrf(html.encode()) ==
+            b'<form><input name="x"></form>')
+
+    no_token = '<form><input name="x"></form>'
+    assert skivvy.remove_csrf(no_token) is no_token
+
+
 def test_request_get_with_session_data():
     class TheCase(ViewTestCase, TestCase):
         view_class = views.GenericView
@@ -546,3 +662,823 @@ def test_request_get_with_session_data():
     assert 'content-type' in response.headers
     assert len(response.messages) == 1
     assert 'Hello world.' in response.messages
+
+
+def test_setup_view_is_cached():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    view = TheCase().setup_view()
+    assert TheCase().setup_view() is view
+    assert TheCase().setup_view(view_kwargs={'test_arg': True}) is not view
+
+
+def test_setup_view_cache_cleared_on_view_class_change():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    view = case.setup_view()
+    TheCase.view_class = views.GenericTemplateView
+    other_view = case.setup_view()
+    assert other_view is not view
+    assert other_view.__name__ == views.GenericTemplateView.__name__
+
+
+def test_setup_view_cache_disabled():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        cache_view = False
+
+    case = TheCase()
+    assert case.setup_view() is not case.setup_view()
+
+
+def test_setup_view_unhashable_view_kwargs():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    view_kwargs = {'test_arg': bytearray(b'abc')}
+    view = case.setup_view(view_kwargs=view_kwargs)
+    assert view.view_initkwargs == view_kwargs
+    assert case.setup_view(view_kwargs=view_kwargs) is not view
+
+
+def test_request_many():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        post_data = {'data': 'value'}
+
+    user = User(username='user')
+    case = TheCase()
+    responses = case.request_many([
+        {'method': 'GET', 'user': user},
+        {'method': 'POST', 'post_data': {'data': 'other'}},
+    ])
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].content == '<h1>Test content<h1>'
+    assert responses[1].content == '<h1>data: other<h1>'
+    assert case._request.method == 'POST'
+    assert not hasattr(case, '_request_defaults')
+
+
+def test_request_many_matrix():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        post_data = {'data': 'value'}
+
+    case = TheCase()
+    responses = case.request_many(
+        matrix={'method': ['GET', 'POST'],
+                'session_data': [{}, {'s_data': 'Session Data'}]})
+
+    assert [r.content for r in responses] == [
+        '<h1>Test content<h1>',
+        '<h1>Test content<h1><p>Session Data</p>',
+        '<h1>data: value<h1>',
+        '<h1>data: value<h1>',
+    ]
+
+
+def test_request_many_builds_defaults_once():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        calls = 0
+
+        def setup_get_data(self):
+            self.calls += 1
+            return {'key': 'value'}
+
+    case = TheCase()
+    case.setup_view = MagicMock(return_value=views.GenericView.as_view())
+    responses = case.request_many(
+        [{'get_data': {'other': 'value'}}, {}], request_meta={'A': 'b'})
+
+    assert len(responses) == 2
+    assert case.calls == 1
+    assert case.setup_view.call_count == 1
+    assert case._request.GET.get('key') == 'value'
+    assert case._request.META['A'] == 'b'
+
+
+def test_request_many_thread_pool():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    values = ['value {}'.format(i) for i in range(20)]
+    responses = case.request_many(
+        [{'method': 'POST', 'post_data': {'data': v}} for v in values],
+        workers=4)
+
+    assert [r.content for r in responses] == [
+        '<h1>data: {}<h1>'.format(v) for v in values]
+    assert case._request.POST['data'] == values[-1]
+
+
+def test_request_many_thread_pool_keeps_requests_apart():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+        def request(self, **kwargs):
+            response = super().request(**kwargs)
+            # Another worker's request must not replace this one.
+            assert self._request.POST['data'] == kwargs['post_data']['data']
+            return response
+
+    case = TheCase()
+    case.request_many(
+        [{'method': 'POST', 'post_data': {'data': str(i)}}
+         for i in range(40)],
+        workers=8)
+
+
+def test_request_from_other_thread_updates_case():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    with futures.ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(case.request, get_data={'key': 'value'}).result()
+    assert case._request.GET['key'] == 'value'
+
+
+def test_request_many_process_pool():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    responses = case.request_many(
+        matrix={'session_data': [{'s_data': str(i)} for i in range(6)]},
+        workers=2, pool='process')
+
+    assert [r.content for r in responses] == [
+        '<h1>Test content<h1><p>{}</p>'.format(i) for i in range(6)]
+    assert all(r.messages == ['Hello world.'] for r in responses)
+    assert [r.raw_content for r in responses] == [
+        r.content.encode() for r in responses]
+
+
+def test_request_many_unknown_pool():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    with pytest.raises(ImproperlyConfigured):
+        case.request_many([{}], workers=2, pool='cluster')
+
+
+def test_async_request():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.AsyncView
+
+    user = User(username='user')
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        response = loop.run_until_complete(
+            case.async_request(user=user, get_data={'n': 1}))
+    finally:
+        loop.close()
+
+    assert case._request.user == user
+    assert response.status_code == 200
+    assert response.content == '<h1>Async 1<h1>'
+    assert response.messages == ['Hello async.']
+
+
+def test_async_request_sync_view():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        response = loop.run_until_complete(case.async_request())
+    finally:
+        loop.close()
+
+    assert response.status_code == 200
+    assert response.content == '<h1>Test content<h1>'
+
+
+def test_async_request_many():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.AsyncView
+
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        responses = loop.run_until_complete(case.async_request_many(
+            matrix={'get_data': [{'n': i} for i in range(5)]}))
+    finally:
+        loop.close()
+
+    assert [r.content for r in responses] == [
+        '<h1>Async {}<h1>'.format(i) for i in range(5)]
+    assert not hasattr(case, '_request_defaults')
+
+
+def test_request_streaming_response():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+
+    case = TheCase()
+    response = case.request()
+    body = b''.join('row {}\n'.format(i).encode() for i in range(100))
+
+    assert response.status_code == 200
+    assert response.content is None
+    assert response.content_length == len(body)
+    assert response.content_digest == hashlib.sha256(body).hexdigest()
+
+
+def test_request_streaming_response_chunks():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+        content_digest_algorithm = 'md5'
+
+    case = TheCase()
+    response = case.request()
+    chunks = response.chunks
+
+    assert next(chunks) == b'row 0\n'
+    assert response.stream.length == 6
+    assert list(chunks)[-1] == b'row 99\n'
+    assert response.content_digest == hashlib.md5(b''.join(
+        'row {}\n'.format(i).encode() for i in range(100))).hexdigest()
+
+
+def test_request_attachment_response():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.AttachmentView
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.content is None
+    assert b''.join(response.chunks) == b'a,b\n1,2\n'
+    assert response.content_length == 8
+    assert response.content_digest == hashlib.sha256(
+        b'a,b\n1,2\n').hexdigest()
+
+
+def test_request_content_digest():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.content_length == len(b'<h1>Test content<h1>')
+    assert response.content_digest == hashlib.sha256(
+        b'<h1>Test content<h1>').hexdigest()
+
+
+def test_render_content_cached():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        template_context = {'id': 'test-id'}
+        _request = HttpRequest()
+
+    case = TheCase()
+    with patch.object(case, '_render_content',
+                      wraps=case._render_content) as render:
+        assert case.expected_content == '<h1>test-id</h1>\n'
+        assert case.expected_content == '<h1>test-id</h1>\n'
+        assert case.render_content(id='other') == '<h1>other</h1>\n'
+        assert case.render_content(id=1) == '<h1>1</h1>\n'
+        assert case.render_content(id=True) == '<h1>True</h1>\n'
+    assert render.call_count == 4
+    assert TheCase.template_context == {'id': 'test-id'}
+
+
+def test_render_content_cache_keyed_by_request():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        template_context = {'id': 'test-id'}
+
+    case = TheCase()
+    with patch.object(case, '_render_content',
+                      wraps=case._render_content) as render:
+        case._request = HttpRequest()
+        case.expected_content
+        case._request = HttpRequest()
+        case.expected_content
+    assert render.call_count == 2
+
+
+def test_render_content_cache_dropped_with_request():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        template_context = {'id': 'test-id'}
+
+    case = TheCase()
+    case._request = HttpRequest()
+    case.expected_content
+    request = weakref.ref(case._request)
+    del case._request
+    gc.collect()
+    assert request() is None
+
+
+def test_render_content_not_cached_for_objects():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        _request = HttpRequest()
+
+        def setup_template_context(self):
+            return {'id': User(username='user')}
+
+    case = TheCase()
+    with patch.object(case, '_render_content',
+                      wraps=case._render_content) as render:
+        assert case.expected_content == '<h1>user</h1>\n'
+        assert case.expected_content == '<h1>user</h1>\n'
+    assert render.call_count == 2
+
+
+def test_render_content_cache_disabled():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        template_context = {'id': 'test-id'}
+        expected_content_cache_size = 0
+        _request = HttpRequest()
+
+    case = TheCase()
+    with patch.object(case, '_render_content',
+                      wraps=case._render_content) as render:
+        case.expected_content
+        case.expected_content
+    assert render.call_count == 2
+
+
+def test_render_content_cache_bounded():
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        expected_content_cache_size = 2
+        _request = HttpRequest()
+
+    case = TheCase()
+    for i in range(5):
+        assert case.render_content(id=i) == '<h1>{}</h1>\n'.format(i)
+    assert len(skivvy._content_cache[case._request]) == 2
+
+
+def test_render_content_template_list():
+    class TheCase(ViewTestCase, TestCase):
+        template = ['missing.html', 'test.html']
+        template_context = {'id': 'test-id'}
+        _request = HttpRequest()
+
+    case = TheCase()
+    assert case.expected_content == '<h1>test-id</h1>\n'
+
+
+def test_template_cache_cleared_on_settings_change():
+    from django.core.signals import setting_changed
+
+    class TheCase(ViewTestCase, TestCase):
+        template = 'test.html'
+        _request = HttpRequest()
+
+    TheCase().render_content(id='test-id')
+    assert skivvy._load_template.cache_info().currsize > 0
+
+    setting_changed.send(sender=None, setting='TEMPLATES', value=None,
+                         enter=True)
+    assert skivvy._load_template.cache_info().currsize == 0
+    assert TheCase._request not in skivvy._content_cache
+
+
+@pytest.mark.django_db
+def test_request_capture_queries():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.QueryView
+        capture_queries = True
+
+    User.objects.create(username='user')
+    case = TheCase()
+    response = case.request()
+
+    assert response.query_count == 2
+    assert response.query_time >= 0
+    assert 'COUNT(*)' in response.queries[0]['sql']
+    assert 'User: user' in response.content
+
+
+@pytest.mark.django_db
+def test_request_queries_not_captured():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.QueryView
+
+    case = TheCase()
+    response = case.request()
+
+    assert response.queries is None
+    assert response.query_count is None
+
+
+@pytest.mark.django_db
+def test_request_max_queries():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.QueryView
+        max_queries = 1
+
+    case = TheCase()
+    with pytest.raises(AssertionError) as e:
+        case.request()
+    assert '2 queries executed, at most 1 expected' in str(e.value)
+    assert 'COUNT(*)' in str(e.value)
+
+    case.max_queries = 2
+    assert case.request().query_count == 2
+
+
+def test_request_timings():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+
+    case = TheCase()
+    response = case.request()
+    assert list(response.timings) == ['defaults', 'encode', 'request',
+                                      'session', 'dispatch']
+
+    response.content
+    assert list(response.timings)[-3:] == ['render', 'csrf', 'decode']
+    assert all(t >= 0 for t in response.timings.values())
+    assert response.timings.total == sum(response.timings.values())
+
+
+def test_request_timings_in_batch():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    responses = case.request_many([{}, {}])
+    assert all('defaults' not in r.timings for r in responses)
+
+
+def test_request_dispatched_signal():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    received = []
+
+    def receiver(sender, test_case, response, **kwargs):
+        received.append((sender, test_case, response))
+
+    request_dispatched.connect(receiver)
+    try:
+        case = TheCase()
+        response = case.request()
+    finally:
+        request_dispatched.disconnect(receiver)
+
+    assert received == [(TheCase, case, response)]
+    assert received[0][2].timings is response.timings
+
+
+def test_request_raw_content():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.CsrfTemplateView
+
+    case = TheCase()
+    response = case.request()
+    assert b'csrfmiddlewaretoken' in response.raw_content
+    assert 'csrfmiddlewaretoken' not in response.content
+
+
+def test_request_raw_content_streaming():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.StreamingView
+
+    case = TheCase()
+    assert case.request().raw_content is None
+
+
+def test_request_template_cloned():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        request_meta = {'HTTP_REFERER': 'http://example.com'}
+
+    case = TheCase()
+    case.request(get_data={'page': 1}, session_data={'s_data': 'first'})
+    first = case._request
+    case.request(request_meta={'HTTP_X_EXTRA': 'yes'})
+    case.request(method='POST', post_data={'key': 'value'})
+    second = case._request
+
+    templates = skivvy._request_templates[TheCase]
+    assert len(templates) == 2
+    assert first.META is not second.META
+    assert first.session is not second.session
+    assert first.GET['page'] == '1'
+    assert first.META['HTTP_REFERER'] == 'http://example.com'
+    assert 'HTTP_X_EXTRA' not in first.META
+    assert second.method == 'POST'
+    assert second.POST['key'] == 'value'
+    assert second.session.get('s_data') is None
+
+
+def test_request_template_meta_overrides():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    case.request(method='POST', post_data={'key': 'value'},
+                 request_meta={'CONTENT_TYPE': 'text/plain',
+                               'SERVER_NAME': 'example.com'})
+    assert case._request.META['CONTENT_TYPE'] == 'text/plain'
+    assert case._request.META['SERVER_NAME'] == 'example.com'
+
+
+def test_request_template_unhashable_meta():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    case.request(request_meta={'HTTP_X_OBJECT': object()})
+    assert 'HTTP_X_OBJECT' in case._request.META
+    assert TheCase not in skivvy._request_templates
+
+
+def test_request_template_disabled():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        cache_request = False
+
+    case = TheCase()
+    response = case.request(method='POST', post_data={'key': 'value'})
+    assert response.content == '<h1>key: value<h1>'
+    assert TheCase not in skivvy._request_templates
+
+
+def test_request_template_delete_uses_factory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+
+    case = TheCase()
+    case.request(method='DELETE')
+    assert case._request.method == 'DELETE'
+    assert TheCase not in skivvy._request_templates
+
+
+class TestSetupClassModels(ViewTestCase, TestCase):
+    view_class = views.GenericView
+    class_setups = 0
+
+    @classmethod
+    def setup_class_models(cls):
+        cls.class_setups += 1
+        cls.owner = User.objects.create(username='owner')
+        cls.users = [cls.owner, User.objects.create(username='other')]
+
+    def setup_models(self):
+        self.setup_models_owner = self.owner
+
+    def test_runs_once_per_class(self):
+        assert type(self).class_setups == 1
+        assert User.objects.count() == 2
+
+    def test_instances_are_copied(self):
+        assert self.owner is not type(self).owner
+        assert self.users[0] is self.owner
+        assert self.setup_models_owner is self.owner
+
+    def test_changes_do_not_leak_1(self):
+        self._change_owner()
+
+    def test_changes_do_not_leak_2(self):
+        self._change_owner()
+
+    def _change_owner(self):
+        assert self.owner.username == 'owner'
+        assert User.objects.get(pk=self.owner.pk).username == 'owner'
+        self.owner.username = 'changed'
+        self.owner.save()
+        User.objects.create(username='third')
+
+
+def test_request_trace_memory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.MemoryView
+        trace_memory = True
+
+    response = TheCase().request()
+    assert response.memory_peak > 500000
+    assert response.memory_net <= response.memory_peak
+    assert not tracemalloc.is_tracing()
+
+
+def test_request_memory_not_traced():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.MemoryView
+
+    response = TheCase().request()
+    assert response.memory_peak is None
+    assert response.memory_net is None
+
+
+def test_request_max_request_memory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.MemoryView
+        max_request_memory = 100000
+
+    with pytest.raises(AssertionError) as e:
+        TheCase().request()
+    assert 'at most 100000 expected' in str(e.value)
+    assert 'Top allocations' not in str(e.value)
+
+
+def test_request_max_request_memory_top_allocations():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.MemoryView
+        max_request_memory = 100000
+        memory_top_allocations = 3
+
+    with pytest.raises(AssertionError) as e:
+        TheCase().request()
+    message = str(e.value)
+    assert 'Top allocations were:\n1. ' in message
+    assert 'tests/views.py' in message
+
+
+def test_request_memory_already_tracing():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.MemoryView
+        trace_memory = True
+
+    tracemalloc.start()
+    try:
+        response = TheCase().request()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert response.memory_peak > 500000
+
+
+def test_request_memory_already_tracing_measures_request_peak():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        trace_memory = True
+
+    tracemalloc.start()
+    try:
+        data = bytearray(10 ** 7)
+        del data
+        response = TheCase().request()
+    finally:
+        tracemalloc.stop()
+    assert response.memory_peak < 10 ** 7
+
+
+def test_request_memory_already_tracing_without_reset_peak(monkeypatch):
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        trace_memory = True
+
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    tracemalloc.start()
+    try:
+        with pytest.raises(ImproperlyConfigured):
+            TheCase().request()
+        # The lock was released, so untraced requests still work.
+        TheCase.trace_memory = False
+        TheCase().request()
+    finally:
+        tracemalloc.stop()
+
+
+def test_request_many_thread_pool_trace_memory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        trace_memory = True
+
+    with pytest.raises(ImproperlyConfigured):
+        TheCase().request_many([{}, {}], workers=2)
+
+
+def _gather(case, count):
+    async def gather():
+        return await asyncio.gather(
+            *[case.async_request() for _ in range(count)],
+            return_exceptions=True)
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(gather())
+    finally:
+        loop.close()
+
+
+def test_async_request_overlapping_trace_memory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.SleepingAsyncView
+        trace_memory = True
+
+    first, second = _gather(TheCase(), 2)
+    assert first.memory_peak is not None
+    assert isinstance(second, ImproperlyConfigured)
+    assert not tracemalloc.is_tracing()
+
+
+def test_async_request_many_trace_memory():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.SleepingAsyncView
+        trace_memory = True
+
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        responses = loop.run_until_complete(
+            case.async_request_many([{}, {}]))
+    finally:
+        loop.close()
+    assert all(r.memory_peak is not None for r in responses)
+
+
+@pytest.mark.django_db
+def test_async_request_many_capture_queries():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.AsyncQueryView
+        capture_queries = True
+
+    case = TheCase()
+    loop = asyncio.new_event_loop()
+    try:
+        responses = loop.run_until_complete(case.async_request_many(
+            matrix={'get_data': [{'queries': 3}, {'queries': 5}]}))
+    finally:
+        loop.close()
+    assert [r.query_count for r in responses] == [3, 5]
+
+
+@pytest.mark.django_db
+def test_async_request_overlapping_capture_queries():
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.AsyncQueryView
+        capture_queries = True
+
+    first, second = _gather(TheCase(), 2)
+    assert first.query_count == 1
+    assert isinstance(second, ImproperlyConfigured)
+
+
+def test_async_request_overlapping_profile(tmpdir):
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.SleepingAsyncView
+        profile_requests = True
+        profile_dir = str(tmpdir)
+
+    first, second = _gather(TheCase(), 2)
+    assert first.status_code == 200
+    assert isinstance(second, ImproperlyConfigured)
+
+
+def test_request_profile(tmpdir, capsys):
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+        profile_requests = True
+        profile_dir = str(tmpdir)
+
+    case = TheCase()
+    case.request()
+    case.request()
+
+    name = re.sub(r'[^\w.-]', '_', case.id())
+    files = sorted(f.basename for f in tmpdir.listdir())
+    assert files == [name + '-1.pstats', name + '-2.pstats']
+    stats = pstats.Stats(str(tmpdir.join(files[0])))
+    assert any(func[2] == 'render' for func in stats.stats)
+    assert capsys.readouterr().out == ''
+
+
+def test_request_profile_threshold(tmpdir, capsys):
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericTemplateView
+        profile_requests = True
+        profile_dir = str(tmpdir)
+        profile_threshold = 0
+        profile_top = 5
+
+    TheCase().request()
+    out = capsys.readouterr().out
+    assert 'more than 0.000s. Profile written to ' in out
+    assert 'cumulative' in out
+
+
+def test_request_profile_env(tmpdir, monkeypatch):
+    class TheCase(ViewTestCase, TestCase):
+        view_class = views.GenericView
+        profile_dir = str(tmpdir)
+
+    monkeypatch.delenv('SKIVVY_PROFILE', raising=False)
+    TheCase().request()
+    assert tmpdir.listdir() == []
+
+    monkeypatch.setenv('SKIVVY_PROFILE', '1')
+    TheCase().request()
+    assert len(tmpdir.listdir()) == 1
@@ -1,6 +1,9 @@
-from django.http import HttpResponse
+import asyncio
+import io
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.views.generic import View, TemplateView
 from django.contrib import messages
+from django.contrib.auth.models import User
 from django.shortcuts import redirect
 
 from rest_framework.views import APIView
@@ -24,6 +27,45 @@ class GenericView(View):
         return HttpResponse('<h1>{}: {}<h1>'.format(field, value[0]))
 
 
+class StreamingView(View):
+    def get(self, request, *args, **kwargs):
+        return StreamingHttpResponse(
+            'row {}\n'.format(i).encode() for i in range(100))
+
+
+class AttachmentView(View):
+    def get(self, request, *args, **kwargs):
+        response = FileResponse(io.BytesIO(b'a,b\n1,2\n'),
+                                content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="data.csv"'
+        return response
+
+
+class UploadView(View):
+    def post(self, request, *args, **kwargs):
+        lines = ['{}={}'.format(k, ','.join(request.POST.getlist(k)))
+                 for k in sorted(request.POST)]
+        lines += ['{}:{}:{}'.format(k, f.name, f.size)
+                  for k, f in sorted(request.FILES.items())]
+        return HttpResponse('\n'.join(lines))
+
+
+class QueryView(TemplateView):
+    template_name = 'test.html'
+
+    def get_context_data(self):
+        User.objects.count()
+        return {'id': User.objects.all()}
+
+
+class MemoryView(TemplateView):
+    template_name = 'test.html'
+
+    def get_context_data(self):
+        return {'id': 'rows', 'rows': ['row {}'.format(i) * 10
+                                       for i in range(10000)]}
+
+
 class GenericTemplateView(TemplateView):
     template_name = 'test.html'
 
@@ -35,6 +77,11 @@ class CsrfTemplateView(TemplateView):
     template_name = 'csrf.html'
 
 
+class RenderedCsrfTemplateView(CsrfTemplateView):
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs).render()
+
+
 class GenericRedirectView(View):
     test_arg = False
 
@@ -54,6 +101,12 @@ class APITestView(APIView):
         return Response({field: value})
 
 
+class APIUploadView(APIView):
+    def post(self, request, *args, **kwargs):
+        return Response({k: [f.name, f.size]
+                         for k, f in request.FILES.items()})
+
+
 class APIXMLTestView(APIView):
     def get(self, request, *args, **kwargs):
         return Response('<some>xml</some>', content_type='application/xml')
@@ -62,3 +115,23 @@ class APIXMLTestView(APIView):
 class APIViewSetTestView(GenericViewSet):
     def list(self, request, *args, **kwargs):
         return Response({"some": "json"})
+
+
+class AsyncView(View):
+    async def get(self, request, *args, **kwargs):
+        messages.add_message(request, messages.INFO, 'Hello async.')
+        return HttpResponse('<h1>Async {}<h1>'.format(request.GET.get('n')))
+
+
+class AsyncQueryView(View):
+    async def get(self, request, *args, **kwargs):
+        for _ in range(int(request.GET.get('queries', 1))):
+            User.objects.count()
+            await asyncio.sleep(0)
+        return HttpResponse('<h1>Counted<h1>')
+
+
+class SleepingAsyncView(View):
+    async def get(self, request, *args, **kwargs):
+        await asyncio.sleep(0)
+        return HttpResponse('<h1>Awake<h1>')